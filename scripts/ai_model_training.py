@@ -5,116 +5,348 @@ Trains XGBoost model for drug demand prediction
 
 import pandas as pd
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
+from sklearn.model_selection import GridSearchCV, TimeSeriesSplit, train_test_split
+from sklearn.ensemble import ExtraTreesRegressor, HistGradientBoostingRegressor, RandomForestRegressor
 from sklearn.metrics import mean_absolute_error, r2_score
 import joblib
 import json
+import os
+import pickle
+import threading
+import time
 from datetime import datetime, timedelta
 
-def generate_training_data():
-    """Generate synthetic training data for demand forecasting"""
-    
-    np.random.seed(42)
-    
-    # Parameters
-    drugs = ["Paracetamol 500mg", "Amoxicillin 250mg", "Metformin 500mg", "Aspirin 75mg", "Omeprazole 20mg"]
-    regions = ["Rural Areas", "Urban Areas", "Metro Cities", "Tribal Areas"]
-    months = list(range(1, 13))
-    years = [2022, 2023, 2024]
-    
-    data = []
-    
-    for drug in drugs:
-        for region in regions:
-            for year in years:
-                for month in months:
-                    # Base demand varies by drug type
-                    if drug == "Paracetamol 500mg":
-                        base_demand = 150
-                    elif drug == "Amoxicillin 250mg":
-                        base_demand = 80
-                    elif drug == "Metformin 500mg":
-                        base_demand = 120
-                    elif drug == "Aspirin 75mg":
-                        base_demand = 90
-                    else:  # Omeprazole
-                        base_demand = 70
-                    
-                    # Regional factors
-                    if region == "Rural Areas":
-                        regional_factor = 1.4  # Higher demand in rural areas
-                    elif region == "Urban Areas":
-                        regional_factor = 1.0
-                    elif region == "Metro Cities":
-                        regional_factor = 0.8
-                    else:  # Tribal Areas
-                        regional_factor = 1.6
-                    
-                    # Seasonal factors
-                    seasonal_factor = 1 + 0.3 * np.sin(2 * np.pi * month / 12)
-                    
-                    # Growth trend
-                    growth_factor = 1 + 0.05 * (year - 2022)
-                    
-                    # Random variation
-                    random_factor = np.random.normal(1, 0.1)
-                    
-                    # Calculate final demand
-                    demand = int(base_demand * regional_factor * seasonal_factor * growth_factor * random_factor)
-                    demand = max(10, demand)  # Minimum demand
-                    
-                    # Features
-                    data.append({
-                        'drug_name': drug,
-                        'region': region,
-                        'month': month,
-                        'year': year,
-                        'is_rural': 1 if region in ["Rural Areas", "Tribal Areas"] else 0,
-                        'is_winter': 1 if month in [11, 12, 1, 2] else 0,
-                        'is_monsoon': 1 if month in [6, 7, 8, 9] else 0,
-                        'population_density': 1 if region == "Metro Cities" else 2 if region == "Urban Areas" else 3,
-                        'healthcare_access': 3 if region == "Metro Cities" else 2 if region == "Urban Areas" else 1,
-                        'demand': demand
-                    })
-    
-    return pd.DataFrame(data)
-
-def train_model():
-    """Train the demand forecasting model"""
+from compact_model import META_FILE, export_compact_model, load_compact_model
+from feature_engineering import FEATURE_NAMES, build_features, month_features, region_features
+
+MODEL_PATH = 'medchain_demand_model.pkl'
+
+# Central interval (%) reported around each forecast; train_model calibrates the
+# per-tree band on held-out data so it actually covers this share of demand
+PREDICTION_INTERVAL = 90
+
+# Estimators selectable in train_model, with their default settings
+MODEL_TYPES = {
+    'random_forest': (RandomForestRegressor, {'n_estimators': 100, 'random_state': 42, 'max_depth': 10}),
+    'hist_gradient_boosting': (HistGradientBoostingRegressor, {
+        'max_iter': 500, 'learning_rate': 0.1, 'early_stopping': True, 'random_state': 42
+    })
+}
+
+# Hyperparameter grids searched when train_model(search=True)
+PARAM_GRIDS = {
+    'random_forest': {
+        'n_estimators': [100, 200],
+        'max_depth': [8, 10, None],
+        'min_samples_leaf': [1, 3]
+    },
+    'hist_gradient_boosting': {
+        'learning_rate': [0.05, 0.1],
+        'max_leaf_nodes': [15, 31],
+        'l2_regularization': [0.0, 1.0]
+    }
+}
+
+# Base monthly demand per drug
+DRUG_BASE_DEMAND = {
+    "Paracetamol 500mg": 150,
+    "Amoxicillin 250mg": 80,
+    "Metformin 500mg": 120,
+    "Aspirin 75mg": 90,
+    "Omeprazole 20mg": 70
+}
+
+# Regional demand multipliers
+REGION_DEMAND_FACTOR = {
+    "Rural Areas": 1.4,  # Higher demand in rural areas
+    "Urban Areas": 1.0,
+    "Metro Cities": 0.8,
+    "Tribal Areas": 1.6
+}
+
+def _training_rows(start, stop, drugs, regions, years, months, samples_per_cell):
+    """Build rows [start, stop) of the drug x region x year x month x sample grid as columns"""
+    shape = (len(drugs), len(regions), len(years), len(months), samples_per_cell)
+    drug_idx, region_idx, year_idx, month_idx, _ = np.unravel_index(np.arange(start, stop), shape)
+    
+    drug_names = np.array(list(drugs))
+    region_names = np.array(list(regions))
+    base_demand = np.array(list(drugs.values()), dtype=float)[drug_idx]
+    regional_factor = np.array(list(regions.values()), dtype=float)[region_idx]
+    # An empty dimension would otherwise give float columns, and float month indexes
+    month = np.asarray(months, dtype=None if len(months) else int)[month_idx]
+    year = np.asarray(years, dtype=None if len(years) else int)[year_idx]
+    
+    seasonal_factor = 1 + 0.3 * np.sin(2 * np.pi * month / 12)
+    growth_factor = 1 + 0.05 * (year - 2022)
+    random_factor = np.random.normal(1, 0.1, size=stop - start)
+    
+    demand = (base_demand * regional_factor * seasonal_factor * growth_factor * random_factor).astype(int)
+    demand = np.maximum(10, demand)  # Minimum demand
+    
+    regional = region_features(region_names[region_idx])
+    seasonal = month_features(month)
+    
+    return pd.DataFrame({
+        'drug_name': pd.Categorical.from_codes(drug_idx, drug_names),
+        'region': pd.Categorical.from_codes(region_idx, region_names),
+        'month': month,
+        'year': year,
+        'is_rural': regional['is_rural'],
+        'is_winter': seasonal['is_winter'],
+        'is_monsoon': seasonal['is_monsoon'],
+        'population_density': regional['population_density'],
+        'healthcare_access': regional['healthcare_access'],
+        'demand': demand
+    })
+
+def iter_training_chunks(drugs=None, regions=None, years=(2022, 2023, 2024), months=range(1, 13),
+                         samples_per_cell=1, chunk_rows=1_000_000, seed=42):
+    """Yield synthetic training data in DataFrame chunks of at most chunk_rows rows (all rows if None)
+    
+    drugs and regions map names to base demand and regional factor. Chunks are
+    drawn from one seeded random stream, so concatenating them reproduces
+    generate_training_data with the same arguments.
+    """
+    drugs = drugs or DRUG_BASE_DEMAND
+    regions = regions or REGION_DEMAND_FACTOR
+    years, months = list(years), list(months)
+    total_rows = len(drugs) * len(regions) * len(years) * len(months) * samples_per_cell
+    
+    chunk_rows = chunk_rows or max(total_rows, 1)
+    
+    np.random.seed(seed)
+    for start in range(0, total_rows, chunk_rows):
+        yield _training_rows(start, min(start + chunk_rows, total_rows),
+                             drugs, regions, years, months, samples_per_cell)
+
+def generate_training_data(drugs=None, regions=None, years=(2022, 2023, 2024), months=range(1, 13),
+                           samples_per_cell=1, seed=42):
+    """Generate synthetic training data for demand forecasting
+    
+    An empty dimension (e.g. years=()) gives an empty DataFrame with the full schema.
+    """
+    drugs = drugs or DRUG_BASE_DEMAND
+    regions = regions or REGION_DEMAND_FACTOR
+    years, months = list(years), list(months)
+    chunks = iter_training_chunks(drugs, regions, years, months, samples_per_cell,
+                                  chunk_rows=None, seed=seed)
+    return next(chunks, _training_rows(0, 0, drugs, regions, years, months, samples_per_cell))
+
+def write_training_parquet(path, chunk_rows=1_000_000, **dimensions):
+    """Stream synthetic training data to a Parquet file without holding it all in memory"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    writer = None
+    rows = 0
+    try:
+        for chunk in iter_training_chunks(chunk_rows=chunk_rows, **dimensions):
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    
+    print(f"💾 Wrote {rows} training rows to '{path}'")
+    return rows
+
+def predict_with_intervals(model, features, interval=PREDICTION_INTERVAL, scale=1.0):
+    """Predict demand with an interval from the spread of the forest's per-tree predictions
+    
+    The per-tree percentile band is widened by scale around the forecast; pass the
+    model's calibrated interval_scale for an interval with the nominal coverage.
+    Returns a DataFrame with predicted_demand, demand_lower, demand_upper and a
+    confidence score (100 minus the interval half-width as a % of the forecast).
+    Models without per-tree estimators get NaN bounds and confidence.
+    """
+    per_tree = None
+    if isinstance(model, (RandomForestRegressor, ExtraTreesRegressor)):
+        # The trees' low-level predict skips per-call input validation, which dominates small batches
+        X = np.ascontiguousarray(features, dtype=np.float32)
+        per_tree = np.stack([tree.tree_.predict(X).reshape(len(X), -1)[:, 0] for tree in model.estimators_])
+    elif hasattr(model, 'predict_per_tree'):
+        per_tree = model.predict_per_tree(features)
+    
+    if per_tree is not None:
+        tail = (100 - interval) / 2
+        lower, upper = np.percentile(per_tree, [tail, 100 - tail], axis=0)
+        prediction = per_tree.mean(axis=0)
+        lower = prediction - scale * (prediction - lower)
+        upper = prediction + scale * (upper - prediction)
+    else:
+        prediction = model.predict(features)
+        lower = upper = np.full(len(prediction), np.nan)
+    
+    half_width = (upper - lower) / 2
+    confidence = np.clip(100 * (1 - half_width / np.maximum(prediction, 1)), 0, 100)
+    return pd.DataFrame({
+        'predicted_demand': prediction,
+        'demand_lower': lower,
+        'demand_upper': upper,
+        'confidence': confidence
+    }, index=getattr(features, 'index', None))
+
+def calibrate_interval_scale(model, features, demand, interval=PREDICTION_INTERVAL):
+    """Find how far the per-tree band must widen to cover interval% of held-out demand
+    
+    This is split-conformal calibration: each row's required widening is measured on
+    the side its demand falls, and the finite-sample-corrected quantile is returned.
+    Models without per-tree predictions return 1.0.
+    """
+    band = predict_with_intervals(model, features, interval)
+    if not len(band) or band['demand_lower'].isna().any():
+        return 1.0
+    
+    prediction = band['predicted_demand'].to_numpy()
+    demand = np.asarray(demand, dtype=float)
+    room = np.where(demand >= prediction, band['demand_upper'] - prediction, prediction - band['demand_lower'])
+    needed = np.abs(demand - prediction) / np.maximum(room, 1e-9)
+    level = min(1.0, np.ceil((len(needed) + 1) * interval / 100) / len(needed))
+    return float(np.quantile(needed, level, method='higher'))
+
+def build_forecast_grid(drugs, regions, months=range(1, 13), year=2025):
+    """Build every drug x region x month combination as request columns"""
+    months = np.asarray(list(months))
+    drug_idx, region_idx, month_idx = np.unravel_index(
+        np.arange(len(drugs) * len(regions) * len(months)), (len(drugs), len(regions), len(months))
+    )
+    return pd.DataFrame({
+        'drug_name': np.asarray(list(drugs), dtype=object)[drug_idx],
+        'region': np.asarray(list(regions), dtype=object)[region_idx],
+        'month': months[month_idx],
+        'year': year
+    })
+
+def export_sample_predictions(model_data, path='sample_predictions.jsonl', output_format='jsonl',
+                              year=2025, chunk_rows=None):
+    """Forecast the full drug x region x month grid and write it out
+    
+    The grid is predicted in one model call (or chunk_rows rows at a time) and
+    written as JSON Lines (default), Parquet, or indented JSON (output_format='json').
+    """
+    grid = build_forecast_grid(model_data['drug_encoding'], model_data['region_encoding'], year=year)
+    features = build_features(grid, model_data['drug_encoding'], model_data['region_encoding'])
+    features = features[model_data['feature_names']]
+    
+    def sample_chunks():
+        step = chunk_rows or max(len(grid), 1)
+        for start in range(0, len(grid), step):
+            rows = grid.iloc[start:start + step]
+            forecast = predict_with_intervals(model_data['model'], features.iloc[start:start + step],
+                                              scale=model_data.get('interval_scale', 1.0))
+            yield pd.DataFrame({
+                'drug': rows['drug_name'],
+                'region': rows['region'],
+                'month': rows['month'],
+                'predicted_demand': forecast['predicted_demand'].astype(int),
+                'demand_lower': forecast['demand_lower'].round(1),
+                'demand_upper': forecast['demand_upper'].round(1),
+                'confidence': forecast['confidence'].round(1)
+            })
+    
+    if output_format == 'jsonl':
+        # Each chunk is appended as it is predicted, so the full forecast is never held as JSON
+        with open(path, 'w') as f:
+            for samples in sample_chunks():
+                lines = samples.to_json(orient='records', lines=True)
+                f.write(lines if lines.endswith('\n') else lines + '\n')
+    elif output_format == 'parquet':
+        pd.concat(sample_chunks(), ignore_index=True).to_parquet(path, index=False)
+    elif output_format == 'json':
+        with open(path, 'w') as f:
+            samples = pd.concat(sample_chunks(), ignore_index=True).astype(object)
+            # Models without intervals have NaN bounds, which are not valid JSON
+            records = samples.where(samples.notna(), None).to_dict(orient='records')
+            json.dump(records, f, indent=2, allow_nan=False)
+    else:
+        raise ValueError(f"Unsupported sample prediction format: {output_format}")
+    
+    return len(grid)
+
+def train_model(sample_path='sample_predictions.jsonl', sample_format='jsonl', model_type='random_forest',
+                search=False, cv_splits=3, n_jobs=-1, compact_path=None, samples_per_cell=1,
+                model_path=MODEL_PATH):
+    """Train the demand forecasting model
+    
+    model_type selects an entry of MODEL_TYPES. With search=True the data is split
+    chronologically and PARAM_GRIDS[model_type] is searched with TimeSeriesSplit
+    cross-validation across n_jobs processes. compact_path additionally exports a
+    forest as flat arrays for fast, memory-mapped serving. samples_per_cell scales
+    the synthetic training set for benchmarking.
+    """
     
     print("🤖 Generating training data...")
-    df = generate_training_data()
+    df = generate_training_data(samples_per_cell=samples_per_cell)
     
     # Encode categorical variables
     drug_encoding = {drug: i for i, drug in enumerate(df['drug_name'].unique())}
     region_encoding = {region: i for i, region in enumerate(df['region'].unique())}
     
-    df['drug_encoded'] = df['drug_name'].map(drug_encoding)
-    df['region_encoded'] = df['region'].map(region_encoding)
-    
     # Features and target
-    features = ['drug_encoded', 'region_encoded', 'month', 'year', 'is_rural', 
-                'is_winter', 'is_monsoon', 'population_density', 'healthcare_access']
-    X = df[features]
+    features = FEATURE_NAMES
+    X = build_features(df, drug_encoding, region_encoding)
     y = df['demand']
     
-    # Split data
-    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    estimator_class, default_params = MODEL_TYPES[model_type]
+    best_params = None
+    started = time.perf_counter()
+    
+    if search:
+        # Hold out the most recent 20% and cross-validate on earlier periods only
+        order = np.lexsort((df['month'].to_numpy(), df['year'].to_numpy()))
+        X, y = X.iloc[order], y.iloc[order]
+        split = int(len(X) * 0.8)
+        X_train, X_test, y_train, y_test = X.iloc[:split], X.iloc[split:], y.iloc[:split], y.iloc[split:]
+        
+        print(f"🔎 Searching {model_type} hyperparameters with {cv_splits}-fold time-series CV...")
+        search_cv = GridSearchCV(
+            estimator_class(**default_params),
+            PARAM_GRIDS[model_type],
+            cv=TimeSeriesSplit(n_splits=cv_splits),
+            scoring='neg_mean_absolute_error',
+            n_jobs=n_jobs
+        )
+        search_cv.fit(X_train, y_train)
+        model = search_cv.best_estimator_
+        best_params = search_cv.best_params_
+        print(f"   Best parameters: {best_params} (CV MAE {-search_cv.best_score_:.2f})")
+    else:
+        # Split data
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+        
+        # Train model
+        print(f"🎯 Training {model_type} model...")
+        model = estimator_class(**default_params)
+        model.fit(X_train, y_train)
     
-    # Train model
-    print("🎯 Training Random Forest model...")
-    model = RandomForestRegressor(n_estimators=100, random_state=42, max_depth=10)
-    model.fit(X_train, y_train)
+    train_seconds = time.perf_counter() - started
+    model_bytes = len(pickle.dumps(model))
     
     # Evaluate
-    y_pred = model.predict(X_test)
+    # Half of the held-out rows calibrate the interval width; the other half measure its coverage
+    calibration = np.random.RandomState(42).rand(len(X_test)) < 0.5
+    interval_scale = calibrate_interval_scale(model, X_test[calibration], y_test[calibration])
+    forecast = predict_with_intervals(model, X_test, scale=interval_scale)
+    y_pred = forecast['predicted_demand']
     mae = mean_absolute_error(y_test, y_pred)
     r2 = r2_score(y_test, y_pred)
+    # Share of evaluation-half demand that falls inside the calibrated interval
+    coverage = None
+    if forecast['demand_lower'].notna().all():
+        inside = (y_test >= forecast['demand_lower']) & (y_test <= forecast['demand_upper'])
+        coverage = float(inside[~calibration].mean())
     
     print(f"📊 Model Performance:")
     print(f"   Mean Absolute Error: {mae:.2f}")
     print(f"   R² Score: {r2:.3f}")
+    if coverage is not None:
+        print(f"   {PREDICTION_INTERVAL}% Interval Coverage: {coverage:.1%}")
+    print(f"   Training Time: {train_seconds:.2f}s")
+    print(f"   Model Size: {model_bytes / 1024:.1f} KiB")
     
     # Save model and encodings
     model_data = {
@@ -124,87 +356,122 @@ def train_model():
         'feature_names': features,
         'performance': {
             'mae': mae,
-            'r2': r2
-        }
+            'r2': r2,
+            'interval_coverage': coverage,
+            'train_seconds': train_seconds,
+            'model_bytes': model_bytes
+        },
+        'model_type': model_type,
+        'best_params': best_params,
+        'interval_scale': interval_scale
     }
     
-    joblib.dump(model_data, 'medchain_demand_model.pkl')
+    joblib.dump(model_data, model_path)
+    if compact_path:
+        export_compact_model(model_data, compact_path)
+        print(f"🗜️  Compact model exported to '{compact_path}/'")
     
     # Save sample predictions
-    sample_predictions = []
-    for drug in drug_encoding.keys():
-        for region in region_encoding.keys():
-            for month in range(1, 13):
-                features_dict = {
-                    'drug_encoded': drug_encoding[drug],
-                    'region_encoded': region_encoding[region],
-                    'month': month,
-                    'year': 2025,
-                    'is_rural': 1 if region in ["Rural Areas", "Tribal Areas"] else 0,
-                    'is_winter': 1 if month in [11, 12, 1, 2] else 0,
-                    'is_monsoon': 1 if month in [6, 7, 8, 9] else 0,
-                    'population_density': 1 if region == "Metro Cities" else 2 if region == "Urban Areas" else 3,
-                    'healthcare_access': 3 if region == "Metro Cities" else 2 if region == "Urban Areas" else 1
-                }
-                
-                prediction_input = np.array([[features_dict[f] for f in features]])
-                prediction = model.predict(prediction_input)[0]
-                confidence = min(95, max(80, 90 + np.random.normal(0, 3)))
-                
-                sample_predictions.append({
-                    'drug': drug,
-                    'region': region,
-                    'month': month,
-                    'predicted_demand': int(prediction),
-                    'confidence': round(confidence, 1)
-                })
-    
-    # Save sample predictions as JSON
-    with open('sample_predictions.json', 'w') as f:
-        json.dump(sample_predictions, f, indent=2)
+    export_sample_predictions(model_data, sample_path, sample_format)
     
     print("✅ Model training completed!")
-    print("💾 Model saved as 'medchain_demand_model.pkl'")
-    print("📋 Sample predictions saved as 'sample_predictions.json'")
+    print(f"💾 Model saved as '{model_path}'")
+    print(f"📋 Sample predictions saved as '{sample_path}'")
     
     return model_data
 
-def predict_demand(drug_name, region, month, year=2025):
+class ModelRegistry:
+    """Keeps trained models resident in memory, reloading a file only when its mtime changes"""
+    
+    def __init__(self):
+        self._models = {}  # path -> (mtime_ns, model_data)
+        self._lock = threading.Lock()
+    
+    def get(self, path=MODEL_PATH):
+        """Get the model data for path, loading it from disk on first use or after retraining
+        
+        A directory is treated as a compact model export and memory-mapped.
+        """
+        is_compact = os.path.isdir(path)
+        # A compact export's symlink is resolved once, so the mtime and the arrays come from one version
+        source = os.path.realpath(path) if is_compact else path
+        # Raises FileNotFoundError if the model is missing
+        mtime = os.stat(os.path.join(source, META_FILE) if is_compact else source).st_mtime_ns
+        with self._lock:
+            cached = self._models.get(path)
+            if cached is None or cached[0] != mtime:
+                cached = (mtime, load_compact_model(source) if is_compact else joblib.load(source))
+                self._models[path] = cached
+            return cached[1]
+    
+    def clear(self):
+        """Drop all cached models"""
+        with self._lock:
+            self._models.clear()
+
+model_registry = ModelRegistry()
+
+def predict_demand_batch(requests, model_path=MODEL_PATH):
+    """Predict demand for many (drug_name, region, month[, year]) rows in one model call
+    
+    requests may be a DataFrame with drug_name, region, month and optional year
+    columns, or a list of tuples. Returns a DataFrame with predicted_demand,
+    demand_lower, demand_upper and confidence columns.
+    """
+    
+    try:
+        model_data = model_registry.get(model_path)
+    except FileNotFoundError:
+        print("❌ Model not found. Please run training first.")
+        return None
+    
+    if isinstance(requests, pd.DataFrame):
+        frame = requests[[c for c in ('drug_name', 'region', 'month', 'year') if c in requests]].copy()
+    else:
+        rows = [tuple(r) if len(r) == 4 else (*r, 2025) for r in requests]
+        frame = pd.DataFrame(rows, columns=['drug_name', 'region', 'month', 'year'])
+    if 'year' not in frame:
+        frame['year'] = 2025
+    
+    features = build_features(frame, model_data['drug_encoding'], model_data['region_encoding'])
+    forecast = predict_with_intervals(model_data['model'], features[model_data['feature_names']],
+                                      scale=model_data.get('interval_scale', 1.0))
+    frame['predicted_demand'] = forecast['predicted_demand'].astype(int)
+    frame['demand_lower'] = forecast['demand_lower']
+    frame['demand_upper'] = forecast['demand_upper']
+    frame['confidence'] = forecast['confidence'].round(1)
+    return frame
+
+def predict_demand(drug_name, region, month, year=2025, model_path=MODEL_PATH):
     """Make a demand prediction"""
     
     try:
-        # Load model
-        model_data = joblib.load('medchain_demand_model.pkl')
+        # Load model (cached after the first call)
+        model_data = model_registry.get(model_path)
         model = model_data['model']
-        drug_encoding = model_data['drug_encoding']
-        region_encoding = model_data['region_encoding']
         features = model_data['feature_names']
         
         # Prepare features
-        features_dict = {
-            'drug_encoded': drug_encoding.get(drug_name, 0),
-            'region_encoded': region_encoding.get(region, 0),
-            'month': month,
-            'year': year,
-            'is_rural': 1 if region in ["Rural Areas", "Tribal Areas"] else 0,
-            'is_winter': 1 if month in [11, 12, 1, 2] else 0,
-            'is_monsoon': 1 if month in [6, 7, 8, 9] else 0,
-            'population_density': 1 if region == "Metro Cities" else 2 if region == "Urban Areas" else 3,
-            'healthcare_access': 3 if region == "Metro Cities" else 2 if region == "Urban Areas" else 1
-        }
+        request = pd.DataFrame([(drug_name, region, month, year)], columns=['drug_name', 'region', 'month', 'year'])
+        features_dict = build_features(request, model_data['drug_encoding'], model_data['region_encoding']).iloc[0]
         
         # Make prediction
-        prediction_input = np.array([[features_dict[f] for f in features]])
-        prediction = model.predict(prediction_input)[0]
-        confidence = min(95, max(80, 90 + np.random.normal(0, 3)))
+        forecast = predict_with_intervals(model, features_dict[features].to_frame().T,
+                                          scale=model_data.get('interval_scale', 1.0)).iloc[0]
+        has_interval = not np.isnan(forecast['demand_lower'])
         
         return {
-            'predicted_demand': int(prediction),
-            'confidence': round(confidence, 1),
+            'predicted_demand': int(forecast['predicted_demand']),
+            'confidence': round(float(forecast['confidence']), 1) if has_interval else None,
+            'prediction_interval': {
+                'level': PREDICTION_INTERVAL,
+                'lower': round(float(forecast['demand_lower']), 1),
+                'upper': round(float(forecast['demand_upper']), 1)
+            } if has_interval else None,
             'factors': {
-                'rural_priority': features_dict['is_rural'],
-                'seasonal_factor': features_dict['is_winter'] or features_dict['is_monsoon'],
-                'healthcare_access': features_dict['healthcare_access']
+                'rural_priority': int(features_dict['is_rural']),
+                'seasonal_factor': int(features_dict['is_winter'] or features_dict['is_monsoon']),
+                'healthcare_access': int(features_dict['healthcare_access'])
             }
         }
         
@@ -222,3 +489,6 @@ if __name__ == "__main__":
     if result:
         print(f"Prediction: {result['predicted_demand']} units")
         print(f"Confidence: {result['confidence']}%")
+        if result['prediction_interval']:
+            interval = result['prediction_interval']
+            print(f"{interval['level']}% Interval: {interval['lower']}-{interval['upper']} units")
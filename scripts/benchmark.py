@@ -0,0 +1,345 @@
+"""
+MedChain Benchmark Suite
+Measures mining, transaction ingestion, model training and inference offline and writes JSON results
+"""
+
+import argparse
+import contextlib
+import cProfile
+import io
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+import numpy as np
+
+from ai_model_training import generate_training_data, model_registry, predict_demand, predict_demand_batch, train_model
+from blockchain_simulator import Block, MedChainBlockchain, OrderingServiceConsensus, ProofOfWorkConsensus
+
+SECTIONS = ["mining", "ingestion", "training", "inference"]
+
+# Default and --quick workloads
+FULL_CONFIG = {
+    "difficulties": [1, 2, 3, 4],
+    "block_sizes": [1, 10, 100, 1000],
+    "mining_repeats": 5,
+    "mining_workers": [1, 2, 4],
+    "consensus": ["proof-of-work", "ordering-service"],
+    "transaction_counts": [1_000, 10_000, 50_000],
+    "samples_per_cell": [1, 5, 25],
+    "single_repeats": 500,
+    "batch_sizes": [1, 10, 100, 1000],
+    "batch_repeats": 50
+}
+QUICK_CONFIG = {
+    "difficulties": [1, 2, 3],
+    "block_sizes": [1, 100],
+    "mining_repeats": 2,
+    "mining_workers": [1, 2],
+    "consensus": ["proof-of-work", "ordering-service"],
+    "transaction_counts": [1_000],
+    "samples_per_cell": [1, 2],
+    "single_repeats": 50,
+    "batch_sizes": [1, 100],
+    "batch_repeats": 10
+}
+
+def percentiles(samples_ms):
+    """Summarize latency samples in milliseconds"""
+    return {
+        "p50_ms": round(float(np.percentile(samples_ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples_ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(samples_ms, 99)), 3),
+        "mean_ms": round(float(np.mean(samples_ms)), 3)
+    }
+
+def measure(fn):
+    """Run fn once for wall time and once under tracemalloc for peak Python-visible memory"""
+    started = time.perf_counter()
+    fn()
+    seconds = time.perf_counter() - started
+
+    # Nest inside a section-wide trace (--tracemalloc-dir) instead of stopping it
+    already_tracing = tracemalloc.is_tracing()
+    if already_tracing:
+        tracemalloc.reset_peak()
+    else:
+        tracemalloc.start()
+    baseline, _ = tracemalloc.get_traced_memory()
+    try:
+        fn()
+        peak = tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        if not already_tracing:
+            tracemalloc.stop()
+    return {"seconds": round(seconds, 4), "peak_memory_mb": round(peak / 2**20, 2)}
+
+def sample_transaction(i):
+    """A CREATE_BATCH transaction shaped like MedChainBlockchain.create_drug_batch builds"""
+    return {
+        "type": "CREATE_BATCH",
+        "batch_id": f"BATCH-{i:09d}",
+        "drug_name": "Paracetamol 500mg",
+        "manufacturer": "Sun Pharma",
+        "quantity": 1000,
+        "manufacture_date": "2024-01-01",
+        "expiry_date": "2026-01-01",
+        "origin": "Hyderabad",
+        "transaction_id": f"TX-{i}",
+        "timestamp": "2024-01-01T00:00:00"
+    }
+
+# Fixed key so ordering-service runs sign the same way every time
+BENCHMARK_SIGNING_KEY = b"medchain-benchmark-orderer-key"
+
+def _mining_engines(consensus, difficulties, workers):
+    """Yield (difficulty, workers, engine) for every engine configuration to benchmark"""
+    for name in consensus:
+        if name == "proof-of-work":
+            for difficulty in difficulties:
+                for worker_count in workers:
+                    yield difficulty, worker_count, ProofOfWorkConsensus(difficulty, worker_count)
+        elif name == "ordering-service":
+            # Signing takes constant time, so difficulty and workers do not apply
+            yield None, None, OrderingServiceConsensus(signing_key=BENCHMARK_SIGNING_KEY)
+        else:
+            raise ValueError(f"Unknown consensus engine: {name}")
+
+def bench_mining(difficulties, block_sizes, repeats, workers=(1,), consensus=("proof-of-work",)):
+    """Block build and seal time by consensus engine, difficulty, mining workers and block size
+
+    Proof-of-work hash counts are the winning nonce + 1; with several workers this
+    approximates the hashes tried, since the nonce space is interleaved across them.
+    """
+    results = []
+    for block_size in block_sizes:
+        transactions = [sample_transaction(i) for i in range(block_size)]
+        for difficulty, worker_count, engine in _mining_engines(consensus, difficulties, workers):
+            hashes, build_seconds, seal_seconds = 0, 0.0, 0.0
+            for repeat in range(repeats):
+                started = time.perf_counter()
+                block = Block(repeat + 1, transactions, "0" * 64)
+                build_seconds += time.perf_counter() - started
+
+                started = time.perf_counter()
+                engine.seal(block)
+                seal_seconds += time.perf_counter() - started
+                hashes += block.nonce + 1
+            if difficulty is None:
+                hashes = None  # One signature per block, no nonce search
+            results.append({
+                "consensus": engine.name,
+                "difficulty": difficulty,
+                "workers": worker_count,
+                "block_size": block_size,
+                "hashes": hashes,
+                "build_ms": round(build_seconds / repeats * 1000, 3),
+                "seal_ms": round(seal_seconds / repeats * 1000, 3),
+                "blocks_per_sec": round(repeats / seal_seconds, 1) if seal_seconds else None,
+                "hashes_per_sec": round(hashes / seal_seconds, 1) if hashes and seal_seconds else None
+            })
+            if difficulty is None:
+                print(f"⛏️  {engine.name}, {block_size} tx: {results[-1]['blocks_per_sec']:,.0f} blocks/sec")
+            else:
+                print(f"⛏️  {engine.name} difficulty {difficulty} x{worker_count} workers, {block_size} tx: "
+                      f"{results[-1]['hashes_per_sec']:,.0f} hashes/sec")
+    return results
+
+def bench_ingestion(transaction_counts, max_batch_size=500, difficulty=2):
+    """add_transaction throughput with and without block cutting"""
+    results = []
+    for count in transaction_counts:
+        for batch_size in (None, max_batch_size):
+            blockchain = MedChainBlockchain(ProofOfWorkConsensus(difficulty=difficulty), max_batch_size=batch_size)
+            transactions = [sample_transaction(i) for i in range(count)]
+            with contextlib.redirect_stdout(io.StringIO()):  # Sealing prints one line per block
+                started = time.perf_counter()
+                for transaction in transactions:
+                    blockchain.add_transaction(transaction)
+                elapsed = time.perf_counter() - started
+            results.append({
+                "transactions": count,
+                "max_batch_size": batch_size,
+                "blocks_sealed": len(blockchain.chain) - 1,
+                "seconds": round(elapsed, 4),
+                "tx_per_sec": round(count / elapsed, 1)
+            })
+            print(f"📥 {count} tx (max_batch_size={batch_size}): {results[-1]['tx_per_sec']:,.0f} tx/sec")
+    return results
+
+def bench_training(samples_per_cell, workdir):
+    """generate_training_data and train_model wall time and peak memory by dataset size"""
+    results = []
+    for samples in samples_per_cell:
+        rows = len(generate_training_data(samples_per_cell=samples))
+
+        def train():
+            train_model(sample_path=os.path.join(workdir, "samples.jsonl"), samples_per_cell=samples,
+                        model_path=os.path.join(workdir, "model.pkl"))
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            results.append({
+                "samples_per_cell": samples,
+                "rows": rows,
+                "generate_training_data": measure(lambda: generate_training_data(samples_per_cell=samples)),
+                "train_model": measure(train)
+            })
+        print(f"🤖 {rows} rows: train_model {results[-1]['train_model']['seconds']:.2f}s, "
+              f"peak {results[-1]['train_model']['peak_memory_mb']:.1f} MiB")
+    return results
+
+def bench_inference(model_path, single_repeats, batch_sizes, batch_repeats, seed=42):
+    """predict_demand single-call latency against predict_demand_batch latency by batch size"""
+    rng = np.random.default_rng(seed)
+    model_data = model_registry.get(model_path)
+    drugs, regions = list(model_data["drug_encoding"]), list(model_data["region_encoding"])
+
+    def random_requests(n):
+        return [(drugs[rng.integers(len(drugs))], regions[rng.integers(len(regions))], int(rng.integers(1, 13)), 2025)
+                for _ in range(n)]
+
+    samples = []
+    for drug_name, region, month, year in random_requests(single_repeats):
+        started = time.perf_counter()
+        predict_demand(drug_name, region, month, year, model_path=model_path)
+        samples.append((time.perf_counter() - started) * 1000)
+    results = {"single": percentiles(samples), "batch": []}
+    print(f"🔮 predict_demand: p50 {results['single']['p50_ms']:.2f}ms, p95 {results['single']['p95_ms']:.2f}ms")
+
+    for batch_size in batch_sizes:
+        samples = []
+        for _ in range(batch_repeats):
+            requests = random_requests(batch_size)
+            started = time.perf_counter()
+            predict_demand_batch(requests, model_path=model_path)
+            samples.append((time.perf_counter() - started) * 1000)
+        entry = {"batch_size": batch_size, **percentiles(samples)}
+        entry["per_row_ms"] = round(entry["p50_ms"] / batch_size, 4)
+        results["batch"].append(entry)
+        print(f"🔮 predict_demand_batch({batch_size}): p50 {entry['p50_ms']:.2f}ms ({entry['per_row_ms']:.3f}ms/row)")
+    return results
+
+def environment():
+    """Record where the numbers came from so runs can be compared between commits"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    import sklearn
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "scikit_learn": sklearn.__version__
+    }
+
+def run_section(name, fn, profile_dir=None, tracemalloc_dir=None):
+    """Run one benchmark section, optionally dumping a cProfile and a tracemalloc snapshot"""
+    profiler = cProfile.Profile() if profile_dir else None
+    if tracemalloc_dir:
+        tracemalloc.start(25)
+    if profiler:
+        profiler.enable()
+    try:
+        return fn()
+    finally:
+        if profiler:
+            profiler.disable()
+            profiler.dump_stats(os.path.join(profile_dir, f"{name}.prof"))
+        if tracemalloc_dir and tracemalloc.is_tracing():
+            tracemalloc.take_snapshot().dump(os.path.join(tracemalloc_dir, f"{name}.tracemalloc"))
+            tracemalloc.stop()
+
+def run_benchmarks(sections=SECTIONS, config=FULL_CONFIG, profile_dir=None, tracemalloc_dir=None):
+    """Run the selected sections and return the results with environment metadata
+
+    Training and inference work in a temporary directory, so no model or sample
+    files are left behind. Inference uses a model trained at the default size.
+    """
+    for directory in (profile_dir, tracemalloc_dir):
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    # Profiling and allocation tracing slow everything down, so such runs are flagged
+    results = {"environment": environment(), "config": config,
+               "instrumented": bool(profile_dir or tracemalloc_dir)}
+    with tempfile.TemporaryDirectory() as workdir:
+        model_path = os.path.join(workdir, "model.pkl")
+        benchmarks = {
+            "mining": lambda: bench_mining(config["difficulties"], config["block_sizes"], config["mining_repeats"],
+                                           config["mining_workers"], config["consensus"]),
+            "ingestion": lambda: bench_ingestion(config["transaction_counts"]),
+            "training": lambda: bench_training(config["samples_per_cell"], workdir),
+            "inference": lambda: bench_inference(model_path, config["single_repeats"],
+                                                 config["batch_sizes"], config["batch_repeats"])
+        }
+        for name in sections:
+            if name == "inference":
+                with contextlib.redirect_stdout(io.StringIO()):
+                    train_model(sample_path=os.path.join(workdir, "samples.jsonl"), model_path=model_path)
+            print(f"\n⏱️  Running {name} benchmarks...")
+            results[name] = run_section(name, benchmarks[name], profile_dir, tracemalloc_dir)
+    return results
+
+def _flatten(value, prefix=""):
+    """Map nested results to {dotted.path: number} for comparison"""
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        items = enumerate(value)
+    else:
+        return {prefix: value} if isinstance(value, (int, float)) and not isinstance(value, bool) else {}
+    flat = {}
+    for key, item in items:
+        flat.update(_flatten(item, f"{prefix}.{key}" if prefix else str(key)))
+    return flat
+
+def compare_results(baseline, current, threshold=0.1):
+    """Print metrics that moved by more than threshold (as a fraction) between two result files"""
+    before = _flatten({name: baseline[name] for name in SECTIONS if name in baseline})
+    after = _flatten({name: current[name] for name in SECTIONS if name in current})
+    if baseline.get("instrumented") != current.get("instrumented"):
+        print("⚠️  Only one of these runs was profiled or traced; timings are not comparable")
+    changes = {}
+    for key in sorted(before.keys() & after.keys()):
+        if before[key] and abs(after[key] - before[key]) / abs(before[key]) > threshold:
+            changes[key] = {"before": before[key], "after": after[key], "change": round(after[key] / before[key] - 1, 3)}
+
+    print(f"\n📊 {len(changes)} metrics changed by more than {threshold:.0%} "
+          f"({baseline['environment'].get('commit')} → {current['environment'].get('commit')}):")
+    for key, change in changes.items():
+        print(f"   {key}: {change['before']} → {change['after']} ({change['change']:+.1%})")
+    return changes
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MedChain mining, ingestion, training and inference")
+    parser.add_argument("--sections", nargs="+", choices=SECTIONS, default=SECTIONS)
+    parser.add_argument("--quick", action="store_true", help="Run smaller workloads for a fast smoke run")
+    parser.add_argument("--output", default="benchmark_results.json", help="Write the results as JSON to this file")
+    parser.add_argument("--profile-dir", help="Dump a cProfile .prof file per section into this directory")
+    parser.add_argument("--tracemalloc-dir", help="Dump a tracemalloc snapshot per section into this directory")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change reported by --compare")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sections, QUICK_CONFIG if args.quick else FULL_CONFIG,
+                             args.profile_dir, args.tracemalloc_dir)
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results saved as '{args.output}'")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(json.load(f), results, args.threshold)
+
+if __name__ == "__main__":
+    main()
@@ -3,91 +3,835 @@ MedChain Blockchain Simulator
 Simulates Hyperledger Fabric blockchain operations for the MVP
 """
 
+import atexit
+import copy
 import hashlib
+import hmac
 import json
+import multiprocessing
+import os
+import queue
+import threading
 import time
+from abc import ABC, abstractmethod
+from collections import defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ledger_storage import BlockIndexLog, SegmentedBlockLog
+
+def hash_transaction(transaction: Dict) -> str:
+    """Calculate the canonical SHA-256 hash of a transaction"""
+    return hashlib.sha256(json.dumps(transaction, sort_keys=True).encode()).hexdigest()
+
+# Domain-separation prefixes so a leaf can never be reinterpreted as an internal node
+MERKLE_LEAF_PREFIX = b"\x00"
+MERKLE_NODE_PREFIX = b"\x01"
+
+def _hash_leaf(leaf_hash: str) -> str:
+    """Hash a transaction hash into its Merkle leaf node"""
+    return hashlib.sha256(MERKLE_LEAF_PREFIX + leaf_hash.encode()).hexdigest()
+
+def _hash_pair(left: str, right: str) -> str:
+    """Hash two child nodes into their parent Merkle node"""
+    return hashlib.sha256(MERKLE_NODE_PREFIX + (left + right).encode()).hexdigest()
+
+def _next_level(level: List[str]) -> List[str]:
+    """Pair up a Merkle level; an unpaired last node is carried up unchanged, never duplicated"""
+    parents = [_hash_pair(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+    if len(level) % 2:
+        parents.append(level[-1])
+    return parents
+
+def compute_merkle_root(leaf_hashes: List[str]) -> str:
+    """Calculate the Merkle root of a list of transaction hashes"""
+    if not leaf_hashes:
+        return hashlib.sha256(b"").hexdigest()
+    
+    level = [_hash_leaf(leaf_hash) for leaf_hash in leaf_hashes]
+    while len(level) > 1:
+        level = _next_level(level)
+    return level[0]
+
+def compute_merkle_proof(leaf_hashes: List[str], index: int) -> List[Tuple[str, str]]:
+    """Build the inclusion proof for the leaf at index as (sibling_hash, side) pairs"""
+    if not 0 <= index < len(leaf_hashes):
+        raise IndexError(f"Transaction index {index} out of range")
+    
+    proof = []
+    level = [_hash_leaf(leaf_hash) for leaf_hash in leaf_hashes]
+    while len(level) > 1:
+        sibling = index ^ 1
+        if sibling < len(level):  # A carried-up node has no sibling at this level
+            proof.append((level[sibling], "left" if sibling < index else "right"))
+        level = _next_level(level)
+        index //= 2
+    return proof
+
+def verify_merkle_proof(leaf_hash: str, proof: List[Tuple[str, str]], merkle_root: str) -> bool:
+    """Check that a transaction hash is included under the given Merkle root"""
+    node = _hash_leaf(leaf_hash)
+    for sibling, side in proof:
+        node = _hash_pair(sibling, node) if side == "left" else _hash_pair(node, sibling)
+    return node == merkle_root
+
+# Nonces each mining worker tries between checks for a newer job
+MINING_CHECK_INTERVAL = 2000
+# Seconds the miner waits for a result before checking that its workers are still alive
+MINING_POLL_INTERVAL = 0.5
+
+def _mine_worker(jobs, results, current_job):
+    """Search every step-th nonce of each job until a valid hash is found or the job is superseded"""
+    while True:
+        job = jobs.get()
+        if job is None:
+            return
+        job_id, header_prefix, difficulty, nonce, step = job
+        target = "0" * difficulty
+        header = hashlib.sha256(header_prefix)
+        while current_job.value == job_id:
+            for _ in range(MINING_CHECK_INTERVAL):
+                attempt = header.copy()
+                attempt.update(str(nonce).encode())
+                digest = attempt.hexdigest()
+                if digest[:difficulty] == target:
+                    results.put((job_id, nonce, digest))
+                    break
+                nonce += step
+            else:
+                continue
+            break
+
+class ParallelMiner:
+    """Long-lived worker processes that split each block's nonce space between them"""
+    
+    def __init__(self, workers: int):
+        self.workers = workers
+        self._lock = threading.Lock()  # One block is mined at a time
+        self._current_job = multiprocessing.Value("q", 0, lock=False)
+        self._results = multiprocessing.Queue()
+        self._jobs = [multiprocessing.Queue() for _ in range(workers)]
+        self._processes: List[Optional[multiprocessing.Process]] = [None] * workers
+    
+    def _ensure_workers(self):
+        """Start any worker that has not started yet or has died since the last block"""
+        for worker_id, process in enumerate(self._processes):
+            if process is None or not process.is_alive():
+                process = multiprocessing.Process(
+                    target=_mine_worker,
+                    args=(self._jobs[worker_id], self._results, self._current_job),
+                    daemon=True
+                )
+                process.start()
+                self._processes[worker_id] = process
+    
+    def mine(self, header_prefix: bytes, difficulty: int) -> Tuple[int, str]:
+        """Return the first (nonce, hash) found for the header, raising if every worker dies"""
+        with self._lock:
+            self._ensure_workers()
+            job_id = self._current_job.value + 1
+            self._current_job.value = job_id
+            for worker_id, jobs in enumerate(self._jobs):
+                jobs.put((job_id, header_prefix, difficulty, worker_id, self.workers))
+            try:
+                while True:
+                    try:
+                        result_job, nonce, digest = self._results.get(timeout=MINING_POLL_INTERVAL)
+                    except queue.Empty:
+                        if all(process.exitcode is not None for process in self._processes):
+                            exitcodes = [process.exitcode for process in self._processes]
+                            raise RuntimeError(f"All mining workers exited without a result (exit codes {exitcodes})")
+                        continue
+                    if result_job == job_id:  # Late results from an earlier block are dropped
+                        return nonce, digest
+            finally:
+                # Cancel the remaining workers as soon as one nonce is found
+                self._current_job.value = job_id + 1
+    
+    def close(self):
+        """Stop the worker processes"""
+        with self._lock:
+            for jobs, process in zip(self._jobs, self._processes):
+                if process is not None and process.is_alive():
+                    jobs.put(None)
+            for process in self._processes:
+                if process is not None:
+                    process.join(timeout=1)
+                    if process.is_alive():
+                        process.terminate()
+            self._processes = [None] * self.workers
+
+# Miners are shared by worker count, so worker processes start once rather than per block
+_miners: Dict[int, ParallelMiner] = {}
+_miners_lock = threading.Lock()
+
+def mine_parallel(header_prefix: bytes, difficulty: int, workers: Optional[int] = None) -> Tuple[int, str]:
+    """Split the nonce space across worker processes and return the first (nonce, hash) found"""
+    workers = workers or os.cpu_count() or 1
+    with _miners_lock:
+        miner = _miners.get(workers)
+        if miner is None:
+            miner = _miners[workers] = ParallelMiner(workers)
+    return miner.mine(header_prefix, difficulty)
+
+@atexit.register
+def _close_miners():
+    for miner in _miners.values():
+        miner.close()
+
+# Snowflake layout: milliseconds since MEDCHAIN_EPOCH_MS | 10-bit node ID | 12-bit sequence
+MEDCHAIN_EPOCH_MS = 1704067200000  # 2024-01-01T00:00:00Z
+NODE_ID_BITS = 10
+SEQUENCE_BITS = 12
+
+class TransactionIdGenerator:
+    """Thread-safe, monotonic Snowflake-style transaction ID generator"""
+    
+    def __init__(self, node_id: Optional[int] = None):
+        # Default to the process ID so separate workers rarely share a node ID.
+        # Within a process, use get_id_generator so every chain shares one sequence per node ID.
+        self.node_id = (os.getpid() if node_id is None else node_id) % (1 << NODE_ID_BITS)
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+    
+    def next_id(self) -> str:
+        """Generate the next unique transaction ID"""
+        with self._lock:
+            now_ms = max(int(time.time() * 1000) - MEDCHAIN_EPOCH_MS, self._last_ms)  # Never run backwards
+            if now_ms == self._last_ms:
+                self._sequence = (self._sequence + 1) & ((1 << SEQUENCE_BITS) - 1)
+                if self._sequence == 0:
+                    # Sequence exhausted for this millisecond; move to the next one
+                    now_ms = self._last_ms + 1
+            else:
+                self._sequence = 0
+            self._last_ms = now_ms
+            snowflake = (now_ms << (NODE_ID_BITS + SEQUENCE_BITS)) | (self.node_id << SEQUENCE_BITS) | self._sequence
+        return f"TX-{snowflake}"
+
+# One generator per node ID in this process: two generators with the same node ID would
+# each start their own sequence and hand out the same IDs within a millisecond
+_id_generators: Dict[int, TransactionIdGenerator] = {}
+_id_generators_lock = threading.Lock()
+
+def get_id_generator(node_id: Optional[int] = None) -> TransactionIdGenerator:
+    """Get the process-wide transaction ID generator for a node ID (the process ID by default)"""
+    node_id = (os.getpid() if node_id is None else node_id) % (1 << NODE_ID_BITS)
+    with _id_generators_lock:
+        generator = _id_generators.get(node_id)
+        if generator is None:
+            generator = _id_generators[node_id] = TransactionIdGenerator(node_id)
+        return generator
 
 class Block:
     """Represents a block in the blockchain"""
     
-    def __init__(self, index: int, transactions: List[Dict], previous_hash: str):
+    def __init__(self, index: int, transactions: List[Dict], previous_hash: str,
+                 transaction_hashes: Optional[List[str]] = None, difficulty: int = 0):
         self.index = index
         self.timestamp = datetime.utcnow().isoformat()
         self.transactions = transactions
         self.previous_hash = previous_hash
+        # Proof-of-work target the block was mined at (0 if it was not mined), part of the hashed header
+        self.difficulty = difficulty
         self.nonce = 0
+        self.signature: Optional[str] = None
+        
+        # Transactions are hashed once (or reuse hashes computed at submit time);
+        # mining only rehashes the fixed-size header
+        self.transaction_hashes = transaction_hashes or [hash_transaction(tx) for tx in transactions]
+        self.merkle_root = compute_merkle_root(self.transaction_hashes)
+        self.header_prefix = self._build_header_prefix()
         self.hash = self.calculate_hash()
     
-    def calculate_hash(self) -> str:
-        """Calculate the hash of the block"""
-        block_string = json.dumps({
+    def to_dict(self) -> Dict:
+        """Serialize the sealed block for storage"""
+        return {
             "index": self.index,
             "timestamp": self.timestamp,
-            "transactions": self.transactions,
             "previous_hash": self.previous_hash,
-            "nonce": self.nonce
-        }, sort_keys=True)
-        return hashlib.sha256(block_string.encode()).hexdigest()
+            "merkle_root": self.merkle_root,
+            "difficulty": self.difficulty,
+            "nonce": self.nonce,
+            "hash": self.hash,
+            "signature": self.signature,
+            "transactions": self.transactions
+        }
     
-    def mine_block(self, difficulty: int = 2):
-        """Mine the block with proof of work"""
+    @classmethod
+    def from_dict(cls, data: Dict) -> "Block":
+        """Rebuild a sealed block from storage without re-sealing it"""
+        block = cls.__new__(cls)
+        block.index = data["index"]
+        block.timestamp = data["timestamp"]
+        block.transactions = data["transactions"]
+        block.previous_hash = data["previous_hash"]
+        block.difficulty = data["difficulty"]
+        block.nonce = data["nonce"]
+        block.signature = data.get("signature")
+        block.transaction_hashes = [hash_transaction(tx) for tx in block.transactions]
+        block.merkle_root = data["merkle_root"]
+        block.header_prefix = block._build_header_prefix()
+        block.hash = data["hash"]
+        return block
+    
+    def _build_header_prefix(self) -> bytes:
+        """Serialize every header field except the nonce"""
+        return f"{self.index}|{self.timestamp}|{self.previous_hash}|{self.merkle_root}|{self.difficulty}|".encode()
+    
+    def calculate_hash(self) -> str:
+        """Calculate the hash of the block header"""
+        return hashlib.sha256(self.header_prefix + str(self.nonce).encode()).hexdigest()
+    
+    def mine_block(self, difficulty: int = 2, workers: int = 1):
+        """Mine the block with proof of work, using several processes when workers > 1"""
+        if difficulty != self.difficulty:
+            # The difficulty is hashed, so a block is always verified against the target it was mined at
+            self.difficulty = difficulty
+            self.header_prefix = self._build_header_prefix()
+            self.hash = self.calculate_hash()
         target = "0" * difficulty
+        if workers > 1 and self.hash[:difficulty] != target:
+            self.nonce, self.hash = mine_parallel(self.header_prefix, difficulty, workers)
+            return
+        
+        header = hashlib.sha256(self.header_prefix)
         while self.hash[:difficulty] != target:
             self.nonce += 1
-            self.hash = self.calculate_hash()
+            attempt = header.copy()
+            attempt.update(str(self.nonce).encode())
+            self.hash = attempt.hexdigest()
+    
+    def get_merkle_proof(self, tx_index: int) -> List[Tuple[str, str]]:
+        """Get the Merkle inclusion proof for a transaction in this block"""
+        return compute_merkle_proof(self.transaction_hashes, tx_index)
+    
+    @staticmethod
+    def verify_transaction(transaction: Dict, proof: List[Tuple[str, str]], merkle_root: str) -> bool:
+        """Verify a single transaction against a block's Merkle root"""
+        return verify_merkle_proof(hash_transaction(transaction), proof, merkle_root)
+
+class ConsensusEngine(ABC):
+    """Seals blocks before they are appended to the chain"""
+    
+    name = "base"
+    
+    @abstractmethod
+    def seal(self, block: Block):
+        """Finalize the block so its hash (and signature, if any) are set"""
+    
+    @abstractmethod
+    def verify(self, block: Block) -> bool:
+        """Check that a block was sealed by this engine"""
+
+class ProofOfWorkConsensus(ConsensusEngine):
+    """Proof-of-work sealing, optionally spread over several processes"""
+    
+    name = "proof-of-work"
+    
+    def __init__(self, difficulty: int = 2, workers: int = 1, min_difficulty: Optional[int] = None):
+        self.difficulty = difficulty
+        self.workers = workers
+        # Lowest difficulty a block may claim; without a floor, a forger could rewrite
+        # blocks at difficulty 0 and rehash them with no work at all
+        self.min_difficulty = max(1, difficulty if min_difficulty is None else min_difficulty)
+    
+    def seal(self, block: Block):
+        block.mine_block(self.difficulty, self.workers)
+    
+    def verify(self, block: Block) -> bool:
+        # Each block carries the difficulty it was mined at, so raising self.difficulty
+        # only affects new blocks and never invalidates the existing chain
+        return (
+            block.difficulty >= self.min_difficulty
+            and block.hash == block.calculate_hash()
+            and block.hash.startswith("0" * block.difficulty)
+        )
+
+class OrderingServiceConsensus(ConsensusEngine):
+    """Permissioned ordering service that signs blocks in constant time, as in Hyperledger Fabric"""
+    
+    name = "ordering-service"
+    
+    def __init__(self, orderer_id: str = "orderer0", signing_key: Optional[bytes] = None):
+        self.orderer_id = orderer_id
+        # A random key only lives as long as this engine, so blocks it signs cannot be
+        # verified after a restart; persisted chains must pass a stable signing_key
+        self.ephemeral_key = signing_key is None
+        self.signing_key = signing_key or os.urandom(32)
+    
+    def _sign(self, block_hash: str) -> str:
+        message = f"{self.orderer_id}|{block_hash}".encode()
+        return hmac.new(self.signing_key, message, hashlib.sha256).hexdigest()
+    
+    def seal(self, block: Block):
+        block.hash = block.calculate_hash()
+        block.signature = self._sign(block.hash)
+    
+    def verify(self, block: Block) -> bool:
+        return (
+            block.signature is not None
+            and block.hash == block.calculate_hash()
+            and hmac.compare_digest(block.signature, self._sign(block.hash))
+        )
+
+def _verify_blocks(block_dicts: List[Dict], consensus: ConsensusEngine) -> Optional[Tuple[int, str]]:
+    """Rehash a run of blocks and return (index, reason) for the first corrupt one"""
+    for data in block_dicts:
+        block = Block.from_dict(data)
+        if compute_merkle_root(block.transaction_hashes) != block.merkle_root:
+            return block.index, "transactions do not match merkle root"
+        if not consensus.verify(block):
+            return block.index, f"invalid {consensus.name} seal"
+    return None
+
+def _verify_stored_blocks(directory: str, start: int, stop: int,
+                          consensus: ConsensusEngine) -> Optional[Tuple[int, str]]:
+    """Decode and rehash blocks start..stop-1 straight from an on-disk ledger"""
+    log = SegmentedBlockLog(directory, lambda data: data, read_only=True)
+    try:
+        for position in range(start, stop):
+            try:
+                block_data = log[position]
+            except IOError as error:
+                return position, str(error)
+            failure = _verify_blocks([block_data], consensus)
+            if failure:
+                return failure
+        return None
+    finally:
+        log.close()
 
 class MedChainBlockchain:
     """MedChain Blockchain Simulator"""
     
-    def __init__(self):
-        self.chain: List[Block] = []
+    def __init__(self, consensus: Optional[ConsensusEngine] = None, mining_workers: int = 1,
+                 max_batch_size: Optional[int] = None, batch_timeout: Optional[float] = None,
+                 storage_dir: Optional[str] = None, checkpoint_key: Optional[bytes] = None,
+                 node_id: Optional[int] = None):
+        # Blocks live in memory unless a storage directory is given, in which case
+        # the chain is an on-disk SegmentedBlockLog that survives restarts
+        self.chain: List[Block] = SegmentedBlockLog(storage_dir, Block.from_dict) if storage_dir else []
         self.pending_transactions: List[Dict] = []
+        self._pending_arrivals: List[float] = []  # Monotonic arrival time of each pending transaction
+        # Guards pending_transactions and chain appends against concurrent producers
+        self._lock = threading.RLock()
         self.mining_reward = 0  # No mining reward for supply chain
-        self.difficulty = 2
+        self.id_generator = get_id_generator(node_id)
+        # Content hashes computed at submit time, reused when the block is built
+        self._transaction_hashes: Dict[str, str] = {}
+        # Worker processes per block; process start-up only pays off at higher difficulty
+        self.consensus = consensus or ProofOfWorkConsensus(difficulty=2, workers=mining_workers)
+        if storage_dir and getattr(self.consensus, "ephemeral_key", False):
+            raise ValueError("A persisted chain needs a stable signing_key for its ordering service; "
+                             "a random key cannot verify the stored blocks after a restart")
+        
+        # Orderer-style block cutting: seal once max_batch_size transactions are
+        # pending or the oldest pending transaction has waited batch_timeout seconds.
+        # Like Fabric's BatchTimeout, a timer cuts the batch even if no more transactions arrive.
+        self.max_batch_size = max_batch_size
+        self.batch_timeout = batch_timeout
+        self._batch_timer: Optional[threading.Timer] = None
+        
+        # Secondary indexes over sealed blocks, kept current as blocks are appended.
+        # An on-disk chain also appends each block's entries to a sidecar log, which a
+        # reopened chain loads on the first query instead of decoding every block.
+        self.batch_index: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.transaction_index: Dict[str, Tuple[int, int]] = {}
+        self.manufacturer_index: Dict[str, List[str]] = defaultdict(list)
+        self._manufacturer_batch_ids: Dict[str, set] = defaultdict(set)  # Dedupes manufacturer_index
+        self._indexed_blocks = 0
+        self._index_log = BlockIndexLog(os.path.join(storage_dir, "tx_index.jsonl")) if storage_dir else None
+        if self._index_log is not None:
+            self._recover_index_log()
+        
+        # Called with every newly sealed block, e.g. to anchor it in MongoDB. Blocks are
+        # queued while the chain lock is held and handed to listeners only after it is
+        # released, in chain order, so a slow listener never holds up sealing.
+        self.block_listeners: List[Callable[[Block], None]] = []
+        self._unnotified_blocks: deque = deque()
+        self._notify_lock = threading.Lock()
+        self._notifying = threading.local()  # Set while this thread is running listeners
+        
+        # Signed checkpoints let validate_chain skip blocks that were already verified.
+        # Pass a stable checkpoint_key to trust checkpoints across restarts.
+        self.checkpoint_key = checkpoint_key or os.urandom(32)
+        self._checkpoint_path = os.path.join(storage_dir, "checkpoint.json") if storage_dir else None
+        self.checkpoint: Optional[Dict] = self._load_checkpoint()
         
         # Create genesis block
-        self.create_genesis_block()
+        if not self.chain:
+            self.create_genesis_block()
+    
+    @property
+    def difficulty(self) -> int:
+        """Proof-of-work difficulty, or 0 when the chain is not mined"""
+        return getattr(self.consensus, "difficulty", 0)
+    
+    @difficulty.setter
+    def difficulty(self, value: int):
+        if not hasattr(self.consensus, "difficulty"):
+            raise AttributeError(f"{self.consensus.name} consensus has no difficulty to set")
+        self.consensus.difficulty = value
+        # Blocks mined at a deliberately lowered difficulty must still verify
+        self.consensus.min_difficulty = min(self.consensus.min_difficulty, max(1, value))
     
     def create_genesis_block(self):
         """Create the first block in the chain"""
         genesis_block = Block(0, [], "0")
-        genesis_block.mine_block(self.difficulty)
+        self.consensus.seal(genesis_block)
         self.chain.append(genesis_block)
+        self._index_block(genesis_block)
     
     def get_latest_block(self) -> Block:
         """Get the latest block in the chain"""
         return self.chain[-1]
     
+    def close(self):
+        """Release the on-disk ledger and index log files, if any"""
+        if isinstance(self.chain, SegmentedBlockLog):
+            self.chain.close()
+        if self._index_log is not None:
+            self._index_log.close()
+    
+    def _stamp_transaction(self, transaction: Dict) -> Dict:
+        """Assign a transaction ID and timestamp, and hash a private copy of the stamped content once
+        
+        The caller's dict is stamped too, but the ledger keeps the copy, so changes the caller
+        makes before sealing cannot make the block disagree with the cached hash.
+        """
+        transaction["transaction_id"] = self.id_generator.next_id()
+        transaction["timestamp"] = datetime.utcnow().isoformat()
+        if any(isinstance(value, (dict, list)) for value in transaction.values()):
+            stamped = copy.deepcopy(transaction)
+        else:
+            stamped = dict(transaction)  # Flat transactions only need a cheap shallow copy
+        self._transaction_hashes[stamped["transaction_id"]] = hash_transaction(stamped)
+        return stamped
+    
     def add_transaction(self, transaction: Dict) -> str:
         """Add a transaction to pending transactions"""
-        transaction_id = f"TX-{int(time.time())}-{hashlib.md5(json.dumps(transaction).encode()).hexdigest()[:8]}"
-        transaction["transaction_id"] = transaction_id
-        transaction["timestamp"] = datetime.utcnow().isoformat()
+        stamped = self._stamp_transaction(transaction)
         
-        self.pending_transactions.append(transaction)
-        return transaction_id
+        with self._lock:
+            self.pending_transactions.append(stamped)
+            self._pending_arrivals.append(time.monotonic())
+            self._arm_batch_timer()
+            
+            if self._batch_ready():
+                self._cut_batches(force=False)
+        self._notify_listeners()
+        return stamped["transaction_id"]
+    
+    def commit_transactions(self, transactions: List[Dict]) -> Block:
+        """Stamp transactions and seal them straight into a new block, bypassing the pending pool"""
+        stamped = [self._stamp_transaction(transaction) for transaction in transactions]
+        with self._lock:
+            block = self._seal_block(stamped)
+        self._notify_listeners()
+        return block
+    
+    def _batch_timed_out(self) -> bool:
+        """Check whether the oldest pending transaction has waited batch_timeout seconds"""
+        return (
+            self.batch_timeout is not None
+            and bool(self._pending_arrivals)
+            and time.monotonic() - self._pending_arrivals[0] >= self.batch_timeout
+        )
     
-    def mine_pending_transactions(self) -> str:
-        """Mine all pending transactions into a new block"""
-        if not self.pending_transactions:
+    def _arm_batch_timer(self, delay: Optional[float] = None):
+        """Schedule a cut for when the oldest pending transaction reaches batch_timeout"""
+        if self.batch_timeout is None or self._batch_timer is not None or not self._pending_arrivals:
+            return
+        if delay is None:
+            delay = max(0.0, self._pending_arrivals[0] + self.batch_timeout - time.monotonic())
+        self._batch_timer = threading.Timer(delay, self._on_batch_timeout)
+        self._batch_timer.daemon = True
+        self._batch_timer.start()
+    
+    def _on_batch_timeout(self):
+        with self._lock:
+            self._batch_timer = None
+            try:
+                self._cut_batches(force=False)
+            except Exception as error:
+                # Nobody waits on the timer thread, so report the failure and retry the
+                # still-pending batch after another batch_timeout instead of dropping it
+                print(f"⚠️  Timed batch cut failed, {len(self.pending_transactions)} transactions still pending: {error}")
+                self._arm_batch_timer(delay=self.batch_timeout)
+        self._notify_listeners()
+    
+    def _batch_ready(self) -> bool:
+        """Check whether the orderer should cut a block now"""
+        if self.max_batch_size and len(self.pending_transactions) >= self.max_batch_size:
+            return True
+        return bool(self.pending_transactions) and self._batch_timed_out()
+    
+    def _seal_block(self, transactions: List[Dict]) -> Block:
+        """Seal a block of transactions with the chain's consensus engine and append it"""
+        transaction_hashes = [
+            self._transaction_hashes.pop(tx["transaction_id"], None) or hash_transaction(tx)
+            for tx in transactions
+        ]
+        block = Block(len(self.chain), transactions, self.get_latest_block().hash, transaction_hashes)
+        
+        print(f"⛏️  Sealing block {block.index} ({self.consensus.name})...")
+        self.consensus.seal(block)
+        self.chain.append(block)
+        self._index_block(block)
+        
+        print(f"✅ Block {block.index} sealed successfully!")
+        self._unnotified_blocks.append(block)
+        return block
+    
+    def add_block_listener(self, listener: Callable[[Block], None]):
+        """Register a callable to run after each block is sealed and appended"""
+        self.block_listeners.append(listener)
+    
+    def _notify_listeners(self):
+        """Hand queued blocks to every listener; call without holding the chain lock"""
+        # A listener that submits transactions re-enters here on the same thread; its
+        # blocks are already queued, so it returns and the outer loop delivers them
+        if getattr(self._notifying, "active", False):
+            return
+        with self._notify_lock:
+            self._notifying.active = True
+            try:
+                while self._unnotified_blocks:
+                    block = self._unnotified_blocks.popleft()
+                    for listener in self.block_listeners:
+                        try:
+                            listener(block)
+                        except Exception as error:
+                            # The block is already on the chain; one failing listener must not affect the others
+                            print(f"⚠️  Block listener {listener!r} failed on block {block.index}: {error}")
+            finally:
+                self._notifying.active = False
+    
+    def mine_pending_transactions(self, force: bool = True) -> Optional[str]:
+        """Cut pending transactions into blocks of at most max_batch_size transactions.
+        
+        Without force, a trailing partial batch (everything pending, when there is no
+        max_batch_size) is kept pending until its oldest transaction has waited batch_timeout.
+        Returns the hash of the last sealed block, or None if nothing was sealed.
+        """
+        with self._lock:
+            latest_hash = self._cut_batches(force)
+        self._notify_listeners()
+        return latest_hash
+    
+    def _cut_batches(self, force: bool) -> Optional[str]:
+        """Seal pending transactions into blocks; the caller holds the chain lock"""
+        latest_hash = None
+        while self.pending_transactions:
+            full = self.max_batch_size and len(self.pending_transactions) >= self.max_batch_size
+            if not (full or force or self._batch_timed_out()):
+                break
+            
+            batch_size = self.max_batch_size or len(self.pending_transactions)
+            batch = self.pending_transactions[:batch_size]
+            # Only drop the batch once it is on the chain, so a failed seal leaves it pending
+            latest_hash = self._seal_block(batch).hash
+            self.pending_transactions = self.pending_transactions[batch_size:]
+            # The timeout clock only moves on to the next-oldest transaction once a batch is cut
+            self._pending_arrivals = self._pending_arrivals[batch_size:]
+        
+        if self.pending_transactions:
+            self._arm_batch_timer()
+        elif self._batch_timer is not None:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+        return latest_hash
+    
+    @staticmethod
+    def _index_entries(block: Block) -> List[Tuple[str, Optional[str], Optional[str]]]:
+        """(transaction_id, batch_id, manufacturer of a CREATE_BATCH) for each transaction"""
+        return [
+            (tx["transaction_id"], tx.get("batch_id"),
+             tx.get("manufacturer") if tx.get("type") == "CREATE_BATCH" and tx.get("batch_id") is not None else None)
+            for tx in block.transactions
+        ]
+    
+    def _apply_index_entries(self, block_index: int, entries: List):
+        """Add one block's index entries to the in-memory indexes"""
+        for tx_index, (transaction_id, batch_id, manufacturer) in enumerate(entries):
+            location = (block_index, tx_index)
+            self.transaction_index[transaction_id] = location
+            if batch_id is not None:
+                self.batch_index[batch_id].append(location)
+                if manufacturer is not None and batch_id not in self._manufacturer_batch_ids[manufacturer]:
+                    self._manufacturer_batch_ids[manufacturer].add(batch_id)
+                    self.manufacturer_index[manufacturer].append(batch_id)
+        self._indexed_blocks = block_index + 1
+    
+    def _recover_index_log(self):
+        """Bring the sidecar index log level with the stored chain after a crash or upgrade"""
+        if self._index_log.count > len(self.chain):
+            self._index_log.reset()
+        for position in range(self._index_log.count, len(self.chain)):
+            self._index_log.append(position, self._index_entries(self.chain[position]))
+    
+    def _index_block(self, block: Block):
+        """Record a newly appended block's transactions in the secondary indexes"""
+        entries = self._index_entries(block)
+        if self._index_log is not None:
+            self._index_log.append(block.index, entries)
+        # A reopened chain's in-memory indexes stay unloaded until the first query
+        if self._indexed_blocks == block.index:
+            self._apply_index_entries(block.index, entries)
+    
+    def _refresh_indexes(self):
+        """Load index entries for stored blocks that predate this process"""
+        with self._lock:
+            if self._indexed_blocks >= len(self.chain):
+                return
+            if self._index_log is not None:
+                for block_index, entries in self._index_log:
+                    if block_index >= self._indexed_blocks:
+                        self._apply_index_entries(block_index, entries)
+            while self._indexed_blocks < len(self.chain):
+                block = self.chain[self._indexed_blocks]
+                self._apply_index_entries(block.index, self._index_entries(block))
+    
+    def _read_transaction(self, location: Tuple[int, int]) -> Dict:
+        """Read one transaction, straight from disk when the chain is persisted"""
+        block_index, tx_index = location
+        if isinstance(self.chain, SegmentedBlockLog):
+            return self.chain.read_transaction(block_index, tx_index)
+        return self.chain[block_index].transactions[tx_index]
+    
+    def get_batch_history(self, batch_id: str) -> List[Dict]:
+        """Get every sealed transaction for a batch, oldest first"""
+        self._refresh_indexes()
+        return [self._read_transaction(location) for location in self.batch_index.get(batch_id, [])]
+    
+    def get_transaction(self, transaction_id: str) -> Optional[Dict]:
+        """Look up a sealed transaction by its ID"""
+        self._refresh_indexes()
+        location = self.transaction_index.get(transaction_id)
+        return self._read_transaction(location) if location else None
+    
+    def get_transaction_block(self, transaction_id: str) -> Optional[Block]:
+        """Get the block containing a sealed transaction"""
+        self._refresh_indexes()
+        location = self.transaction_index.get(transaction_id)
+        return self.chain[location[0]] if location else None
+    
+    def get_manufacturer_batches(self, manufacturer: str) -> List[str]:
+        """Get the IDs of all batches created by a manufacturer"""
+        self._refresh_indexes()
+        return list(self.manufacturer_index.get(manufacturer, []))
+    
+    def _sign_checkpoint(self, index: int, block_hash: str) -> str:
+        return hmac.new(self.checkpoint_key, f"{index}|{block_hash}".encode(), hashlib.sha256).hexdigest()
+    
+    def _load_checkpoint(self) -> Optional[Dict]:
+        """Load the persisted checkpoint; a missing or unreadable one means a full validation"""
+        if not self._checkpoint_path or not os.path.exists(self._checkpoint_path):
+            return None
+        try:
+            with open(self._checkpoint_path) as f:
+                checkpoint = json.load(f)
+        except (OSError, ValueError) as error:
+            print(f"⚠️  Ignoring unreadable checkpoint {self._checkpoint_path}: {error}")
             return None
+        if not isinstance(checkpoint, dict) or not {"index", "hash", "signature"} <= checkpoint.keys():
+            return None
+        return checkpoint
+    
+    def create_checkpoint(self) -> Dict:
+        """Sign the current chain tip as trusted after a successful validation"""
+        latest = self.get_latest_block()
+        self.checkpoint = {
+            "index": latest.index,
+            "hash": latest.hash,
+            "signature": self._sign_checkpoint(latest.index, latest.hash)
+        }
+        if self._checkpoint_path:
+            # Written aside and renamed into place, so a crash never leaves a torn checkpoint
+            staging = f"{self._checkpoint_path}.tmp"
+            with open(staging, "w") as f:
+                json.dump(self.checkpoint, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(staging, self._checkpoint_path)
+        return self.checkpoint
+    
+    def _trusted_checkpoint_index(self) -> int:
+        """Get the index of the last block covered by a valid checkpoint, or -1"""
+        checkpoint = self.checkpoint
+        if not checkpoint or checkpoint["index"] >= len(self.chain):
+            return -1
+        expected = self._sign_checkpoint(checkpoint["index"], checkpoint["hash"])
+        if not hmac.compare_digest(expected, checkpoint["signature"]):
+            return -1
+        if self.chain[checkpoint["index"]].hash != checkpoint["hash"]:
+            return -1
+        return checkpoint["index"]
+    
+    def validate_chain(self, workers: Optional[int] = None, use_checkpoint: bool = True,
+                       update_checkpoint: bool = False) -> Dict:
+        """Validate hash links serially and rehash blocks in parallel.
         
-        block = Block(
-            len(self.chain),
-            self.pending_transactions.copy(),
-            self.get_latest_block().hash
-        )
+        Only blocks after the last trusted checkpoint are checked when use_checkpoint is set.
+        Returns a report with the first corrupt block index, or None if the chain is valid.
+        """
+        workers = workers or os.cpu_count() or 1
+        start = self._trusted_checkpoint_index() + 1 if use_checkpoint else 0
+        on_disk = isinstance(self.chain, SegmentedBlockLog)
+        failures: List[Tuple[int, str]] = []
         
-        print(f"⛏️  Mining block {block.index}...")
-        block.mine_block(self.difficulty)
+        # Link checks are cheap and inherently sequential; on disk they read only the
+        # stored headers, leaving transactions to be decoded and hashed once, by the workers
+        stop = start
+        previous_hash = "0"
+        try:
+            if start:
+                previous_hash = self.chain.read_header(start - 1)["hash"] if on_disk else self.chain[start - 1].hash
+            for position in range(start, len(self.chain)):
+                header = self.chain.read_header(position) if on_disk else self.chain[position].to_dict()
+                if header["index"] != position:
+                    failures.append((position, "block index out of order"))
+                    break
+                if header["previous_hash"] != previous_hash:
+                    failures.append((position, "previous_hash does not match preceding block"))
+                    break
+                previous_hash = header["hash"]
+                stop = position + 1
+        except IOError as error:
+            failures.append((stop, str(error)))
         
-        self.chain.append(block)
-        self.pending_transactions = []
+        # Rehashing is independent per block, so it is spread across processes
+        chunk_size = max(1, -(-(stop - start) // (workers * 4)))
+        starts = list(range(start, stop, chunk_size))
+        stops = [min(chunk_start + chunk_size, stop) for chunk_start in starts]
+        consensus = [self.consensus] * len(starts)
+        if on_disk:
+            # Workers open the ledger read-only and decode their own position ranges
+            verify, args = _verify_stored_blocks, ([self.chain.directory] * len(starts), starts, stops, consensus)
+        else:
+            chunks = [[self.chain[i].to_dict() for i in range(a, b)] for a, b in zip(starts, stops)]
+            verify, args = _verify_blocks, (chunks, consensus)
+        if workers > 1 and len(starts) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                results = list(executor.map(verify, *args))
+        else:
+            results = list(map(verify, *args))
+        failures.extend(result for result in results if result)
         
-        print(f"✅ Block {block.index} mined successfully!")
-        return block.hash
+        first_failure = min(failures) if failures else None
+        report = {
+            "valid": first_failure is None,
+            "first_invalid_index": first_failure[0] if first_failure else None,
+            "reason": first_failure[1] if first_failure else None,
+            "checked_from": start,
+            "blocks_checked": len(self.chain) - start
+        }
+        if report["valid"] and update_checkpoint:
+            self.create_checkpoint()
+        return report
     
     def create_drug_batch(self, batch_data: Dict) -> str:
         """Create a new drug batch on blockchain"""
@@ -96,4 +840,10 @@ class MedChainBlockchain:
             "batch_id": batch_data["batch_id"],
             "drug_name": batch_data["drug_name"],
             "manufacturer": batch_data["manufacturer"],
-            "quantity": batch_data
+            "quantity": batch_data["quantity"],
+            "manufacture_date": batch_data.get("manufacture_date"),
+            "expiry_date": batch_data.get("expiry_date"),
+            "origin": batch_data.get("origin"),
+            "qr_code": batch_data.get("qr_code")
+        }
+        return self.add_transaction(transaction)
@@ -0,0 +1,221 @@
+"""
+MedChain Bulk Data Seeding
+Generates production-scale collections in streaming chunks and loads them in parallel
+"""
+
+import argparse
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+
+from data_access import DATABASE_NAME, MANUFACTURER_LOCATION_MAP, MONGODB_URI, get_database
+from setup_database import hash_passcode
+
+DRUGS = ["Paracetamol 500mg", "Amoxicillin 250mg", "Metformin 500mg", "Aspirin 75mg", "Omeprazole 20mg"]
+REGIONS = ["Rural Areas", "Urban Areas", "Metro Cities", "Tribal Areas"]
+DEMAND_YEARS = [2024, 2023, 2022]  # demand_history cycles through these, newest first, at any scale
+LOCATIONS = [
+    ("Rural Health Center - Rajasthan", "rural"),
+    ("Primary Health Center - Bihar", "rural"),
+    ("AIIMS Delhi", "urban"),
+    ("District Hospital - Pune", "urban")
+]
+MANUFACTURER_ORIGINS = [(m, origin) for m, origins in MANUFACTURER_LOCATION_MAP.items() for origin in origins]
+
+# Documents are keyed by a sequence number so IDs stay unique at any scale
+def batch_id(i):
+    return f"BATCH-{i:09d}"
+
+def qr_code(i):
+    return f"QR-{i:09d}"
+
+def make_drug_batch(i, rng, now):
+    manufacturer, origin = MANUFACTURER_ORIGINS[i % len(MANUFACTURER_ORIGINS)]
+    manufacture_date = now - timedelta(days=rng.randint(30, 180))
+    expiry_date = manufacture_date + timedelta(days=rng.randint(365, 1095))
+    return {
+        "batch_id": batch_id(i),
+        "drug_name": DRUGS[i % len(DRUGS)],
+        "manufacturer": manufacturer,
+        "manufacture_date": manufacture_date.strftime("%Y-%m-%d"),
+        "expiry_date": expiry_date.strftime("%Y-%m-%d"),
+        "quantity": rng.randint(500, 2000),
+        "origin": origin,
+        "qr_code": qr_code(i),
+        "blockchain_tx_id": f"TX-{rng.randint(1000000000, 9999999999)}",
+        "status": "active",
+        "created_at": now
+    }
+
+def make_scan_record(i, rng, now, batches):
+    batch = rng.randrange(max(batches, 1))
+    location, location_type = LOCATIONS[i % len(LOCATIONS)]
+    return {
+        "scan_id": f"SCAN-{i:010d}",
+        "batch_id": batch_id(batch),
+        "qr_code": qr_code(batch),
+        "location": location,
+        "location_type": location_type,
+        "result": "authentic" if rng.random() > 0.01 else "suspicious",
+        "scanned_at": now - timedelta(seconds=rng.randint(0, 90 * 86400))
+    }
+
+def make_patient(i, rng, now):
+    location, _ = LOCATIONS[i % len(LOCATIONS)]
+    return {
+        "patient_id": f"PAT{i:08d}",
+        "aadhaar_id": str(100000000000 + i),  # Unique 12-digit ID
+        "name": f"Patient {i}",
+        "age": rng.randint(1, 90),
+        "location": location,
+        "admin_passcode_hash": hash_passcode(f"ADMIN{i}"),
+        "verification_status": "verified",
+        "health_history": [],
+        "medicines_purchased": [],
+        "created_at": now
+    }
+
+def make_dummy_number(i, rng, now, patients):
+    return {
+        "dummy_number": f"EMG{i:07d}",
+        "patient_id": f"PAT{i % max(patients, 1):08d}",
+        "used": rng.random() < 0.1,
+        "created_at": now
+    }
+
+def make_inventory_item(i, rng, now, batches):
+    location, location_type = LOCATIONS[i % len(LOCATIONS)]
+    batch = i % max(batches, 1)
+    min_threshold = rng.randint(80, 120) if location_type == "rural" else rng.randint(40, 60)
+    return {
+        "drug_name": DRUGS[batch % len(DRUGS)],
+        "current_stock": rng.randint(0, 500),
+        "min_threshold": min_threshold,
+        "max_capacity": rng.randint(300, 600),
+        "location": f"{location} #{i // len(LOCATIONS)}",
+        "location_type": location_type,
+        "batch_id": batch_id(batch),
+        "expiry_date": (now + timedelta(days=rng.randint(-30, 1000))).strftime("%Y-%m-%d"),
+        "last_updated": now
+    }
+
+def make_demand_record(i, rng, now):
+    region = REGIONS[i % len(REGIONS)]
+    base_demand = rng.randint(50, 200)
+    if region in ["Rural Areas", "Tribal Areas"]:
+        base_demand = int(base_demand * 1.4)
+    return {
+        "drug_name": DRUGS[(i // len(REGIONS)) % len(DRUGS)],
+        "region": region,
+        "month": (i // (len(REGIONS) * len(DRUGS))) % 12 + 1,
+        "year": DEMAND_YEARS[i // (len(REGIONS) * len(DRUGS) * 12) % len(DEMAND_YEARS)],
+        "demand": base_demand,
+        "factors": {
+            "seasonal": rng.uniform(0.8, 1.2),
+            "epidemic": rng.uniform(0.9, 1.1),
+            "supply_chain": rng.uniform(0.95, 1.05)
+        }
+    }
+
+_mongomock_clients = {}
+
+def _database(uri, use_mongomock, name=DATABASE_NAME):
+    """Get the shared pooled database, or an in-process mongomock one shared by threads"""
+    if not use_mongomock:
+        return get_database(uri, name)
+    if uri not in _mongomock_clients:
+        import mongomock
+        _mongomock_clients[uri] = mongomock.MongoClient()
+    return _mongomock_clients[uri][name]
+
+def _insert_chunk(uri, use_mongomock, collection, start, stop, seed, scale, database=DATABASE_NAME):
+    """Generate documents [start, stop) for a collection and insert them unordered"""
+    rng = random.Random(seed * 1_000_003 + start)
+    now = datetime.utcnow()
+    builders = {
+        "drug_batches": lambda i: make_drug_batch(i, rng, now),
+        "scan_records": lambda i: make_scan_record(i, rng, now, scale["drug_batches"]),
+        "patients": lambda i: make_patient(i, rng, now),
+        "dummy_numbers": lambda i: make_dummy_number(i, rng, now, scale["patients"]),
+        "inventory": lambda i: make_inventory_item(i, rng, now, scale["drug_batches"]),
+        "demand_history": lambda i: make_demand_record(i, rng, now)
+    }
+    build = builders[collection]
+    documents = [build(i) for i in range(start, stop)]
+    _database(uri, use_mongomock, database)[collection].insert_many(documents, ordered=False)
+    return len(documents)
+
+def seed_at_scale(drug_batches=100_000, scan_records=500_000, patients=50_000, dummy_numbers=100_000,
+                  inventory=20_000, demand_history=100_000, chunk_size=10_000, workers=4,
+                  uri=MONGODB_URI, use_mongomock=False, drop=True, seed=42, database=DATABASE_NAME):
+    """Seed every collection at the given sizes and report throughput
+
+    Each worker generates its own chunk from a (start, stop) range, so documents
+    never cross process boundaries. mongomock keeps data in-process, so it is
+    loaded with threads instead of processes.
+    """
+    scale = {
+        "drug_batches": drug_batches,
+        "scan_records": scan_records,
+        "patients": patients,
+        "dummy_numbers": dummy_numbers,
+        "inventory": inventory,
+        "demand_history": demand_history
+    }
+
+    db = _database(uri, use_mongomock, database)
+    if drop:
+        for collection in scale:
+            db[collection].drop()
+
+    executor_class = ThreadPoolExecutor if use_mongomock else ProcessPoolExecutor
+    report = {}
+    started = time.perf_counter()
+    with executor_class(max_workers=workers) as executor:
+        for collection, count in scale.items():
+            collection_started = time.perf_counter()
+            futures = [
+                executor.submit(_insert_chunk, uri, use_mongomock, collection,
+                                start, min(start + chunk_size, count), seed, scale, database)
+                for start in range(0, count, chunk_size)
+            ]
+            inserted = sum(future.result() for future in as_completed(futures))
+            elapsed = time.perf_counter() - collection_started
+            report[collection] = {
+                "documents": inserted,
+                "seconds": round(elapsed, 3),
+                "docs_per_sec": round(inserted / elapsed, 1) if elapsed else None
+            }
+            print(f"📦 {collection}: {inserted} docs in {elapsed:.2f}s ({inserted / max(elapsed, 1e-9):,.0f} docs/sec)")
+
+    total = sum(entry["documents"] for entry in report.values())
+    elapsed = time.perf_counter() - started
+    report["total"] = {"documents": total, "seconds": round(elapsed, 3), "docs_per_sec": round(total / elapsed, 1)}
+    print(f"✅ Seeded {total} documents in {elapsed:.2f}s ({total / elapsed:,.0f} docs/sec)")
+    return report
+
+def main():
+    parser = argparse.ArgumentParser(description="Seed MedChain collections at production scale")
+    parser.add_argument("--drug-batches", type=int, default=100_000)
+    parser.add_argument("--scan-records", type=int, default=500_000)
+    parser.add_argument("--patients", type=int, default=50_000)
+    parser.add_argument("--dummy-numbers", type=int, default=100_000)
+    parser.add_argument("--inventory", type=int, default=20_000)
+    parser.add_argument("--demand-history", type=int, default=100_000)
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--uri", default=MONGODB_URI)
+    parser.add_argument("--mongomock", action="store_true", help="Seed an in-memory mongomock database")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    seed_at_scale(
+        drug_batches=args.drug_batches, scan_records=args.scan_records, patients=args.patients,
+        dummy_numbers=args.dummy_numbers, inventory=args.inventory, demand_history=args.demand_history,
+        chunk_size=args.chunk_size, workers=args.workers, uri=args.uri,
+        use_mongomock=args.mongomock, seed=args.seed
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+MedChain Compact Model Format
+Stores tree ensembles as flat NumPy arrays for memory-mapped loading and vectorized inference
+"""
+
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+COMPACT_ARRAYS = ['feature', 'threshold', 'children_left', 'children_right', 'value', 'roots']
+META_FILE = 'meta.json'
+# Rows walked together; keeps the per-level gathers cache-sized
+ROW_BLOCK = 1024
+
+def export_compact_model(model_data, path):
+    """Write a forest model and its encodings as one .npy file per node array plus meta.json
+
+    Nodes of every tree are concatenated; child indexes are rewritten to global
+    positions and roots holds each tree's first node. path is a symlink to a
+    versioned sibling directory: each export is written to a new version and the
+    link is replaced atomically, so path always names a complete export and
+    processes that memory-mapped an earlier version keep reading it unchanged.
+    """
+    model = model_data['model']
+    trees = getattr(model, 'estimators_', None)
+    if trees is None or not hasattr(trees[0], 'tree_'):
+        raise ValueError(f"Compact export needs a forest of decision trees, got {type(model).__name__}")
+
+    arrays = {name: [] for name in COMPACT_ARRAYS if name != 'roots'}
+    roots = []
+    offset = 0
+    max_depth = 0
+    for estimator in trees:
+        tree = estimator.tree_
+        leaves = tree.children_left < 0
+        roots.append(offset)
+        arrays['feature'].append(np.where(leaves, -1, tree.feature).astype(np.int32))
+        arrays['threshold'].append(tree.threshold.astype(np.float64))
+        arrays['children_left'].append(np.where(leaves, -1, tree.children_left + offset).astype(np.int32))
+        arrays['children_right'].append(np.where(leaves, -1, tree.children_right + offset).astype(np.int32))
+        arrays['value'].append(tree.value[:, 0, 0].astype(np.float64))
+        offset += tree.node_count
+        max_depth = max(max_depth, tree.max_depth)
+
+    path = os.path.abspath(path)
+    staging = tempfile.mkdtemp(prefix=f'.{os.path.basename(path)}-', dir=os.path.dirname(path))
+    os.chmod(staging, 0o755)
+    try:
+        for name, parts in arrays.items():
+            np.save(os.path.join(staging, f'{name}.npy'), np.concatenate(parts))
+        np.save(os.path.join(staging, 'roots.npy'), np.asarray(roots, dtype=np.int64))
+        _write_meta(model_data, max_depth, staging)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    _swap_in(staging, path)
+
+def _write_meta(model_data, max_depth, path):
+    # A fresh meta.json mtime tells model_registry to reload the export
+    meta = {
+        'model_type': model_data.get('model_type', 'random_forest'),
+        'max_depth': int(max_depth),
+        'drug_encoding': model_data['drug_encoding'],
+        'region_encoding': model_data['region_encoding'],
+        'feature_names': list(model_data['feature_names']),
+        'performance': model_data.get('performance', {}),
+        'interval_scale': model_data.get('interval_scale', 1.0)
+    }
+    with open(os.path.join(path, META_FILE), 'w') as f:
+        json.dump(meta, f, default=float)
+
+def _swap_in(staging, path):
+    """Point the path symlink at a finished export with one atomic rename"""
+    link = f'{staging}.link'
+    os.symlink(os.path.basename(staging), link)  # Relative, so the export can be moved as a whole
+    if os.path.isdir(path) and not os.path.islink(path):
+        # A plain directory cannot be replaced by a symlink in one rename; move it aside once
+        os.replace(path, f'{staging}.old')
+    previous = os.path.realpath(path) if os.path.islink(path) else None
+    os.replace(link, path)
+    _remove_stale_versions(path, keep={os.path.basename(staging), os.path.basename(previous or '')})
+
+def _remove_stale_versions(path, keep):
+    """Delete versions older than the previous one, which a reader may still be loading"""
+    directory, prefix = os.path.dirname(path), f'.{os.path.basename(path)}-'
+    for name in os.listdir(directory):
+        if name.startswith(prefix) and name not in keep and not name.endswith('.link'):
+            shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+
+class CompactForest:
+    """Forest regressor evaluated directly over memory-mapped node arrays"""
+
+    def __init__(self, arrays, max_depth):
+        for name in COMPACT_ARRAYS:
+            setattr(self, name, arrays[name])
+        self.max_depth = max_depth
+
+    def predict_per_tree(self, X) -> np.ndarray:
+        """Walk every tree for every row and return leaf values as (n_trees, n_rows)"""
+        X = np.asarray(X, dtype=np.float32)  # sklearn compares float32 features to thresholds
+        if len(X) <= ROW_BLOCK:
+            return self._walk(X)
+        return np.concatenate([self._walk(X[start:start + ROW_BLOCK])
+                               for start in range(0, len(X), ROW_BLOCK)], axis=1)
+
+    def _walk(self, X) -> np.ndarray:
+        """Advance all (tree, row) cursors one level per step until each reaches a leaf"""
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+
+        # One cursor per (tree, row) pair, tree-major; only cursors still at split nodes move
+        node = np.repeat(np.asarray(self.roots), n_rows)
+        row_start = np.tile(np.arange(n_rows) * n_features, len(self.roots))
+        active = np.arange(len(node))
+
+        for _ in range(self.max_depth):
+            feature = np.take(self.feature, node[active])
+            splitting = feature >= 0
+            active, feature = active[splitting], feature[splitting]
+            if not len(active):
+                break
+            current = node[active]
+            go_left = np.take(flat_X, row_start[active] + feature) <= np.take(self.threshold, current)
+            node[active] = np.where(go_left, np.take(self.children_left, current),
+                                    np.take(self.children_right, current))
+
+        return np.take(self.value, node).reshape(len(self.roots), n_rows)
+
+    def predict(self, X) -> np.ndarray:
+        """Average the per-tree predictions, as a random forest does"""
+        return self.predict_per_tree(X).mean(axis=0)
+
+def load_compact_model(path):
+    """Load a compact model directory with mmap'd arrays, returning the same keys as the pickled model"""
+    # Resolve the symlink once so every file comes from the same version
+    path = os.path.realpath(path)
+    with open(os.path.join(path, META_FILE)) as f:
+        meta = json.load(f)
+
+    arrays = {name: np.load(os.path.join(path, f'{name}.npy'), mmap_mode='r') for name in COMPACT_ARRAYS}
+    return {
+        'model': CompactForest(arrays, meta['max_depth']),
+        'drug_encoding': meta['drug_encoding'],
+        'region_encoding': meta['region_encoding'],
+        'feature_names': meta['feature_names'],
+        'performance': meta['performance'],
+        'model_type': meta['model_type'],
+        'interval_scale': meta.get('interval_scale', 1.0)
+    }
@@ -0,0 +1,209 @@
+"""
+MedChain Data Access Layer
+Shared pooled MongoDB client, typed repository functions and read caches for the scripts
+"""
+
+import copy
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+import pymongo
+from bson import ObjectId
+
+# MongoDB connection (override with MEDCHAIN_MONGODB_URI for MongoDB Atlas)
+MONGODB_URI = os.environ.get("MEDCHAIN_MONGODB_URI", "mongodb://localhost:27017/")  # Local MongoDB for demo
+DATABASE_NAME = os.environ.get("MEDCHAIN_DATABASE", "medchain_mvp")
+
+# Manufacturer to Origin Location Mapping
+MANUFACTURER_LOCATION_MAP = {
+    "Dr. Reddy's": ["Mumbai", "Chennai"],
+    "Sun Pharma": ["Hyderabad", "Ahmedabad"],
+    "Cipla Ltd": ["Goa", "Bangalore"],
+    "Lupin Ltd": ["Pune", "Aurangabad"],
+    "Aurobindo Pharma": ["Hyderabad", "Vizag"]
+}
+
+# Connection pool and timeout settings shared by every script
+CLIENT_OPTIONS = {
+    "maxPoolSize": 50,
+    "minPoolSize": 5,
+    "maxIdleTimeMS": 60_000,
+    "serverSelectionTimeoutMS": 5_000,
+    "connectTimeoutMS": 5_000,
+    "socketTimeoutMS": 30_000,
+    "waitQueueTimeoutMS": 10_000,
+    "retryWrites": True,
+    "retryReads": True,
+    # Reads go to the primary, falling back to secondaries only while it is unavailable
+    "readPreference": "primaryPreferred"
+}
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(uri: str = MONGODB_URI) -> pymongo.MongoClient:
+    """Get the shared client for uri, creating it once per process (clients are not fork-safe)"""
+    key = (os.getpid(), uri)
+    with _clients_lock:
+        if key not in _clients:
+            _clients[key] = pymongo.MongoClient(uri, **CLIENT_OPTIONS)
+        return _clients[key]
+
+def use_client(client, uri: str = MONGODB_URI):
+    """Register an existing client (e.g. mongomock) as the shared client for uri in this process"""
+    with _clients_lock:
+        _clients[(os.getpid(), uri)] = client
+
+def get_database(uri: str = MONGODB_URI, name: str = DATABASE_NAME):
+    """Get the MedChain database from the shared client"""
+    return get_client(uri)[name]
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ttl seconds"""
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, loader):
+        """Return a copy of the cached value for key, calling loader() on a miss or after expiry
+
+        Callers get their own copy, so mutating a result never changes what others read.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > now:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(entry[1])
+            self.misses += 1
+
+        value = loader()
+        if value is None:
+            return None  # Misses are not cached, so new records show up immediately
+        with self._lock:
+            self._data[key] = (now + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return copy.deepcopy(value)
+
+    def invalidate(self, key=None):
+        """Drop one key, or everything when key is None"""
+        with self._lock:
+            if key is None:
+                self._data.clear()
+            else:
+                self._data.pop(key, None)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "size": len(self._data)
+            }
+
+batch_cache = TTLCache(maxsize=50_000, ttl=60.0)
+origin_cache = TTLCache(maxsize=1_000, ttl=3600.0)
+
+def cache_stats() -> Dict:
+    """Hit/miss counters for every read cache"""
+    return {"batches": batch_cache.stats(), "origins": origin_cache.stats()}
+
+# Drug batches
+
+# Cache keys start with the database name, so lookups against different databases never share entries
+
+def get_batch_by_qr(qr_code: str, db=None) -> Optional[Dict]:
+    """Look up a drug batch by QR code (cached)"""
+    db = db if db is not None else get_database()
+    return batch_cache.get((db.name, "qr", qr_code), lambda: db.drug_batches.find_one({"qr_code": qr_code}))
+
+def get_batch(batch_id: str, db=None) -> Optional[Dict]:
+    """Look up a drug batch by batch ID (cached)"""
+    db = db if db is not None else get_database()
+    return batch_cache.get((db.name, "batch", batch_id), lambda: db.drug_batches.find_one({"batch_id": batch_id}))
+
+def invalidate_batch(batch_id: str, qr_code: str, db=None):
+    """Drop a drug batch's cached lookups in one database after it is written"""
+    db = db if db is not None else get_database()
+    batch_cache.invalidate((db.name, "batch", batch_id))
+    batch_cache.invalidate((db.name, "qr", qr_code))
+
+def get_manufacturer_origins(manufacturer: str, db=None) -> List[str]:
+    """Get a manufacturer's origin locations from MANUFACTURER_LOCATION_MAP, else from recorded batches (cached)"""
+    db = db if db is not None else get_database()
+
+    def load():
+        if manufacturer in MANUFACTURER_LOCATION_MAP:
+            return list(MANUFACTURER_LOCATION_MAP[manufacturer])
+        return sorted(db.drug_batches.distinct("origin", {"manufacturer": manufacturer}))
+
+    return origin_cache.get((db.name, manufacturer), load)
+
+# Patients
+
+def get_patient_by_aadhaar(aadhaar_id: str, db=None) -> Optional[Dict]:
+    """Look up a patient by Aadhaar ID"""
+    db = db if db is not None else get_database()
+    return db.patients.find_one({"aadhaar_id": aadhaar_id})
+
+def get_unused_dummy_number(patient_id: str, db=None) -> Optional[Dict]:
+    """Get an unused emergency dummy number for a patient"""
+    db = db if db is not None else get_database()
+    return db.dummy_numbers.find_one({"patient_id": patient_id, "used": False})
+
+# Inventory
+
+def get_inventory(location: str, drug_name: Optional[str] = None, db=None) -> List[Dict]:
+    """List inventory at a location, optionally for one drug"""
+    db = db if db is not None else get_database()
+    query = {"location": location}
+    if drug_name is not None:
+        query["drug_name"] = drug_name
+    return list(db.inventory.find(query))
+
+def get_low_stock_items(location_type: Optional[str] = None, db=None) -> List[Dict]:
+    """List inventory below its minimum threshold"""
+    db = db if db is not None else get_database()
+    query = {"$expr": {"$lt": ["$current_stock", "$min_threshold"]}}
+    if location_type is not None:
+        query["location_type"] = location_type
+    return list(db.inventory.find(query))
+
+# Demand history
+
+DEMAND_PROJECTION = {"_id": 1, "drug_name": 1, "region": 1, "month": 1, "year": 1, "demand": 1}
+
+def iter_demand_history(since: Optional[datetime] = None, batch_size: int = 5000,
+                        projection: Optional[Dict] = None, db=None) -> Iterator[List[Dict]]:
+    """Yield lists of demand_history records whose ObjectId was generated at or after since, in _id order
+
+    ObjectIds are made by each client, so concurrent writers do not insert them in
+    order; callers resuming from a point in time should re-read an overlap window.
+    """
+    db = db if db is not None else get_database()
+    query = {"_id": {"$gte": ObjectId.from_datetime(since)}} if since else {}
+    cursor = (db.demand_history.find(query, projection or DEMAND_PROJECTION)
+              .sort("_id", pymongo.ASCENDING).batch_size(batch_size))
+
+    batch = []
+    for document in cursor:
+        batch.append(document)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
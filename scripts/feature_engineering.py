@@ -0,0 +1,90 @@
+"""
+MedChain Feature Engineering
+Shared demand-forecasting features for training and serving, built from lookup tables
+"""
+
+import numpy as np
+import pandas as pd
+
+# Static region attributes. Add new regions here; every feature consumer picks them up.
+REGION_PROFILES = {
+    "Rural Areas": {"is_rural": 1, "population_density": 3, "healthcare_access": 1},
+    "Urban Areas": {"is_rural": 0, "population_density": 2, "healthcare_access": 2},
+    "Metro Cities": {"is_rural": 0, "population_density": 1, "healthcare_access": 3},
+    "Tribal Areas": {"is_rural": 1, "population_density": 3, "healthcare_access": 1}
+}
+# Attributes used for regions missing from REGION_PROFILES
+UNKNOWN_REGION_PROFILE = {"is_rural": 0, "population_density": 3, "healthcare_access": 1}
+
+RURAL_REGIONS = [region for region, profile in REGION_PROFILES.items() if profile["is_rural"]]
+WINTER_MONTHS = [11, 12, 1, 2]
+MONSOON_MONTHS = [6, 7, 8, 9]
+
+FEATURE_NAMES = ['drug_encoded', 'region_encoded', 'month', 'year', 'is_rural',
+                 'is_winter', 'is_monsoon', 'population_density', 'healthcare_access']
+
+REGION_NAMES = list(REGION_PROFILES)
+REGION_ATTRIBUTES = ["is_rural", "population_density", "healthcare_access"]
+REGION_INDEX = pd.Index(REGION_NAMES)
+
+# Region lookup arrays indexed by category code; the trailing entry serves code -1 (unknown)
+REGION_LOOKUP = {
+    attribute: np.array([REGION_PROFILES[r][attribute] for r in REGION_NAMES]
+                        + [UNKNOWN_REGION_PROFILE[attribute]])
+    for attribute in REGION_ATTRIBUTES
+}
+
+# Month lookup arrays indexed directly by month number (index 0 unused)
+MONTH_LOOKUP = {
+    "is_winter": np.isin(np.arange(13), WINTER_MONTHS).astype(int),
+    "is_monsoon": np.isin(np.arange(13), MONSOON_MONTHS).astype(int)
+}
+
+def region_codes(regions) -> np.ndarray:
+    """Map region names to REGION_LOOKUP indexes, with -1 for unknown regions"""
+    return REGION_INDEX.get_indexer(regions)
+
+def region_features(regions) -> dict:
+    """Derive region attribute columns for an array of region names"""
+    codes = region_codes(regions)
+    return {attribute: REGION_LOOKUP[attribute][codes] for attribute in REGION_ATTRIBUTES}
+
+def validate_months(months) -> np.ndarray:
+    """Check that every month number is a whole number in 1..12"""
+    months = np.asarray(months)
+    if months.size and not np.issubdtype(months.dtype, np.integer):
+        if not np.issubdtype(months.dtype, np.number) or np.any(months != np.round(months)):
+            raise ValueError(f"Months must be whole numbers 1-12, got {months[:5].tolist()}")
+        months = months.astype(int)
+    invalid = months[(months < 1) | (months > 12)]
+    if invalid.size:
+        raise ValueError(f"Months must be between 1 and 12, got {sorted(set(invalid.tolist()))[:5]}")
+    return months
+
+def month_features(months) -> dict:
+    """Derive seasonal flag columns for an array of month numbers"""
+    months = validate_months(months)
+    return {flag: lookup[months] for flag, lookup in MONTH_LOOKUP.items()}
+
+def encode_column(values, encoding: dict) -> np.ndarray:
+    """Apply a categorical encoding to a column, mapping unseen values to 0"""
+    return pd.Series(values).astype(object).map(encoding).fillna(0).astype(int).to_numpy()
+
+def build_features(frame: pd.DataFrame, drug_encoding: dict, region_encoding: dict) -> pd.DataFrame:
+    """Build the model's feature matrix from drug_name, region, month and year columns"""
+    region = frame['region'].to_numpy()
+    month = frame['month'].to_numpy()
+    regions = region_features(region)
+    months = month_features(month)
+
+    return pd.DataFrame({
+        'drug_encoded': encode_column(frame['drug_name'].to_numpy(), drug_encoding),
+        'region_encoded': encode_column(region, region_encoding),
+        'month': month,
+        'year': frame['year'].to_numpy(),
+        'is_rural': regions['is_rural'],
+        'is_winter': months['is_winter'],
+        'is_monsoon': months['is_monsoon'],
+        'population_density': regions['population_density'],
+        'healthcare_access': regions['healthcare_access']
+    }, index=frame.index)[FEATURE_NAMES]
@@ -0,0 +1,151 @@
+"""
+MedChain Incremental Model Training
+Streams new demand_history records from MongoDB and grows the forest with warm-started trees
+"""
+
+import json
+import os
+from datetime import datetime, timedelta
+
+import joblib
+import numpy as np
+import pandas as pd
+from bson import ObjectId
+from sklearn.ensemble import ExtraTreesRegressor, RandomForestRegressor
+from sklearn.metrics import mean_absolute_error
+
+from ai_model_training import MODEL_PATH, calibrate_interval_scale, predict_with_intervals
+from data_access import get_database, iter_demand_history
+from feature_engineering import build_features
+
+TRAINING_STATE_PATH = 'training_state.json'
+# Records are re-read this far behind the high-water mark, because ObjectIds from
+# concurrent writers (e.g. bulk_seed workers) do not arrive in _id order
+OVERLAP_SECONDS = 120
+# Share of each update batch held out of fitting to recalibrate the prediction interval
+CALIBRATION_FRACTION = 0.2
+
+def load_training_state(path=TRAINING_STATE_PATH):
+    """Load the high-water mark, the oldest untrained record time and the recently trained record IDs"""
+    if not os.path.exists(path):
+        return {'high_water_time': None, 'untrained_since': None, 'recent_ids': [], 'records_trained': 0}
+    with open(path) as f:
+        return json.load(f)
+
+def save_training_state(state, path=TRAINING_STATE_PATH):
+    """Persist the high-water mark after the updated model has been saved"""
+    with open(path, 'w') as f:
+        json.dump(state, f)
+
+def _extend_encoding(encoding, values):
+    """Give unseen drugs or regions the next free codes, keeping existing codes stable"""
+    for value in pd.unique(values):
+        if value not in encoding:
+            encoding[value] = len(encoding)
+
+def update_model_from_history(db=None, model_path=MODEL_PATH, state_path=TRAINING_STATE_PATH,
+                              batch_size=5000, trees_per_update=10, max_trees=300,
+                              overlap_seconds=OVERLAP_SECONDS, calibration_fraction=CALIBRATION_FRACTION):
+    """Pull new demand_history records and add warm-started trees trained on them
+
+    Streamed records are buffered until at least batch_size are waiting, so each
+    update's trees_per_update trees are fit to a full batch rather than to a few
+    late records; a smaller remainder is left untrained for the next run. Once the
+    forest holds more than max_trees, the oldest trees are retired. A
+    calibration_fraction of each batch is held out of fitting and used to
+    recalibrate interval_scale for the updated forest.
+
+    Streaming restarts overlap_seconds before the high-water mark (or at the oldest
+    untrained record, if earlier) and skips records already used, so late inserts
+    with older ObjectIds are still picked up. The model and the mark are saved only
+    after all batches succeed, so a failed run is simply retried from the previous mark.
+    """
+    if db is None:
+        db = get_database()
+
+    model_data = joblib.load(model_path)
+    model = model_data['model']
+    if not isinstance(model, (RandomForestRegressor, ExtraTreesRegressor)):
+        raise ValueError(f"Incremental updates need a random forest or extra-trees model, got {type(model).__name__}")
+
+    state = load_training_state(state_path)
+    high_water = datetime.fromisoformat(state['high_water_time']) if state['high_water_time'] else None
+    untrained_since = datetime.fromisoformat(state['untrained_since']) if state.get('untrained_since') else None
+    trained_ids = set(state['recent_ids'])
+    recent = {}  # ObjectId -> generation time of records used in this run
+    features = model_data['feature_names']
+    model.set_params(warm_start=True)
+    rng = np.random.RandomState(42)
+    new_records = 0
+    maes = []
+    calibration_X, calibration_y = [], []
+    buffer = []
+
+    since = high_water - timedelta(seconds=overlap_seconds) if high_water else None
+    if untrained_since is not None and (since is None or untrained_since < since):
+        since = untrained_since
+    print(f"📥 Streaming demand_history from {since or 'the beginning'}...")
+    for records in iter_demand_history(since, batch_size, db=db):
+        buffer.extend(record for record in records if str(record['_id']) not in trained_ids)
+        if len(buffer) < batch_size:
+            continue
+        batch = pd.DataFrame(buffer)
+        _extend_encoding(model_data['drug_encoding'], batch['drug_name'])
+        _extend_encoding(model_data['region_encoding'], batch['region'])
+        X = build_features(batch, model_data['drug_encoding'], model_data['region_encoding'])[features]
+        y = batch['demand'].to_numpy()
+
+        # Prequential check: score the current model on records it has not seen yet
+        maes.append(mean_absolute_error(y, predict_with_intervals(model, X)['predicted_demand']))
+
+        held_out = rng.rand(len(X)) < calibration_fraction
+        calibration_X.append(X[held_out])
+        calibration_y.append(y[held_out])
+        model.set_params(n_estimators=len(model.estimators_) + trees_per_update)
+        model.fit(X[~held_out], y[~held_out])
+        if len(model.estimators_) > max_trees:
+            model.estimators_ = model.estimators_[-max_trees:]
+            model.set_params(n_estimators=max_trees)
+
+        new_records += len(batch)
+        recent.update((str(record['_id']), record['_id'].generation_time) for record in buffer)
+        buffer = []
+
+    # Too few records for a batch; the next run re-reads them from their oldest ObjectId
+    if buffer:
+        untrained_since = min(record['_id'].generation_time for record in buffer)
+        print(f"⏳ Holding {len(buffer)} records until at least {batch_size} are available")
+    else:
+        untrained_since = None
+    state['untrained_since'] = untrained_since.isoformat() if untrained_since else None
+
+    if not new_records:
+        save_training_state(state, state_path)
+        print("✅ No full batch of new demand records; model unchanged")
+        return model_data
+
+    # Keep only the IDs that the next run's re-read window will cover
+    high_water = max([high_water, *recent.values()] if high_water else recent.values())
+    cutoff = high_water - timedelta(seconds=overlap_seconds)
+    if untrained_since is not None:
+        cutoff = min(cutoff, untrained_since)
+    state['recent_ids'] = sorted(
+        record_id for record_id in trained_ids | set(recent) if ObjectId(record_id).generation_time >= cutoff
+    )
+    state['high_water_time'] = high_water.isoformat()
+    state['records_trained'] += new_records
+    # The old scale was calibrated for a different forest; recalibrate on rows no tree was fit to
+    model_data['interval_scale'] = calibrate_interval_scale(
+        model, pd.concat(calibration_X), np.concatenate(calibration_y)
+    )
+    model_data['performance']['incremental_mae'] = float(np.mean(maes))
+    joblib.dump(model_data, model_path)
+    save_training_state(state, state_path)
+
+    print(f"✅ Updated model with {new_records} new records ({len(model.estimators_)} trees)")
+    print(f"📊 MAE on new records before update: {model_data['performance']['incremental_mae']:.2f}")
+    print(f"📏 Recalibrated interval scale: {model_data['interval_scale']:.2f}")
+    return model_data
+
+if __name__ == "__main__":
+    update_model_from_history()
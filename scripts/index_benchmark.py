@@ -0,0 +1,126 @@
+"""
+MedChain Index Benchmark
+Measures hot lookup latency on seeded collections before and after index provisioning
+"""
+
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+from bulk_seed import DRUGS, LOCATIONS, _database, qr_code, seed_at_scale
+from data_access import DATABASE_NAME, MONGODB_URI, get_low_stock_items
+from setup_database import COLLECTION_INDEXES, create_indexes
+
+# Seeding drops and refills collections, so the benchmark never touches the app's database by default
+BENCHMARK_DATABASE = "medchain_index_benchmark"
+
+def lookup_queries(db, scale, rng):
+    """Build the lookups run by the app's QR, Aadhaar, inventory and emergency flows"""
+    def location():
+        name, _ = rng.choice(LOCATIONS)
+        return f"{name} #{rng.randrange(max(scale['inventory'] // len(LOCATIONS), 1))}"
+
+    return {
+        "batch_by_qr_code": lambda: db.drug_batches.find_one({"qr_code": qr_code(rng.randrange(scale["drug_batches"]))}),
+        "recent_scans_by_qr_code": lambda: list(
+            db.scan_records.find({"qr_code": qr_code(rng.randrange(scale["drug_batches"]))})
+            .sort("scanned_at", -1).limit(10)
+        ),
+        "patient_by_aadhaar": lambda: db.patients.find_one(
+            {"aadhaar_id": str(100000000000 + rng.randrange(scale["patients"]))}
+        ),
+        "inventory_by_location_drug": lambda: list(db.inventory.find({"location": location(), "drug_name": rng.choice(DRUGS)})),
+        # The app's own low-stock query: current_stock below each item's min_threshold
+        "rural_low_stock": lambda: get_low_stock_items("rural", db=db),
+        "unused_dummy_number": lambda: db.dummy_numbers.find_one(
+            {"patient_id": f"PAT{rng.randrange(scale['patients']):08d}", "used": False}
+        )
+    }
+
+def time_lookups(queries, repeats):
+    """Run each lookup repeats times and return p50/p95 latency in milliseconds"""
+    results = {}
+    for name, query in queries.items():
+        samples = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            query()
+            samples.append((time.perf_counter() - started) * 1000)
+        results[name] = {
+            "p50_ms": round(float(np.percentile(samples, 50)), 3),
+            "p95_ms": round(float(np.percentile(samples, 95)), 3)
+        }
+    return results
+
+def run_benchmark(drug_batches=200_000, scan_records=500_000, patients=100_000, dummy_numbers=200_000,
+                  inventory=50_000, repeats=200, uri=MONGODB_URI, use_mongomock=False, workers=4, seed=42,
+                  database=BENCHMARK_DATABASE, allow_app_database=False):
+    """Seed collections, time lookups without secondary indexes, provision indexes and time them again
+
+    The collections in database are dropped and reseeded; the app's own database is
+    refused unless allow_app_database is set. mongomock does not use indexes when
+    querying, so meaningful numbers need a real mongod.
+    """
+    if database == DATABASE_NAME and not allow_app_database:
+        raise ValueError(f"Refusing to drop and reseed the app database '{DATABASE_NAME}'; "
+                         "pick another database or pass allow_app_database=True")
+    scale = {
+        "drug_batches": drug_batches, "scan_records": scan_records, "patients": patients,
+        "dummy_numbers": dummy_numbers, "inventory": inventory
+    }
+    seed_at_scale(demand_history=0, workers=workers, uri=uri, use_mongomock=use_mongomock, seed=seed,
+                  database=database, **scale)
+    db = _database(uri, use_mongomock, database)
+    for collection in COLLECTION_INDEXES:
+        db[collection].drop_indexes()
+
+    print("⏱️  Timing lookups without indexes...")
+    before = time_lookups(lookup_queries(db, scale, random.Random(seed)), repeats)
+
+    started = time.perf_counter()
+    create_indexes(db)
+    build_seconds = time.perf_counter() - started
+
+    print("⏱️  Timing lookups with indexes...")
+    after = time_lookups(lookup_queries(db, scale, random.Random(seed)), repeats)
+
+    print(f"\n{'lookup':<28}{'p50 before':>12}{'p50 after':>12}{'p95 before':>12}{'p95 after':>12}")
+    for name in before:
+        print(f"{name:<28}{before[name]['p50_ms']:>10.3f}ms{after[name]['p50_ms']:>10.3f}ms"
+              f"{before[name]['p95_ms']:>10.3f}ms{after[name]['p95_ms']:>10.3f}ms")
+    print(f"\n🗂️  Index build took {build_seconds:.2f}s")
+
+    return {"scale": scale, "index_build_seconds": round(build_seconds, 3), "before": before, "after": after}
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MedChain lookups before and after indexing")
+    parser.add_argument("--drug-batches", type=int, default=200_000)
+    parser.add_argument("--scan-records", type=int, default=500_000)
+    parser.add_argument("--patients", type=int, default=100_000)
+    parser.add_argument("--dummy-numbers", type=int, default=200_000)
+    parser.add_argument("--inventory", type=int, default=50_000)
+    parser.add_argument("--repeats", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--uri", default=MONGODB_URI)
+    parser.add_argument("--mongomock", action="store_true")
+    parser.add_argument("--database", default=BENCHMARK_DATABASE, help="Database to drop, seed and benchmark")
+    parser.add_argument("--allow-app-database", action="store_true",
+                        help=f"Allow --database {DATABASE_NAME}, wiping the app's collections")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run_benchmark(
+        drug_batches=args.drug_batches, scan_records=args.scan_records, patients=args.patients,
+        dummy_numbers=args.dummy_numbers, inventory=args.inventory, repeats=args.repeats,
+        uri=args.uri, use_mongomock=args.mongomock, workers=args.workers,
+        database=args.database, allow_app_database=args.allow_app_database
+    )
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == "__main__":
+    main()
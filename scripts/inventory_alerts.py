@@ -0,0 +1,223 @@
+"""
+MedChain Inventory Alert Engine
+Keeps low-stock and near-expiry inventory in a priority heap updated from MongoDB changes
+"""
+
+import heapq
+import itertools
+import time
+from datetime import datetime, timedelta
+
+import pymongo
+
+from data_access import get_database
+
+# Priority weights
+STOCK_WEIGHT = 1.0
+EXPIRY_WEIGHT = 1.0
+RURAL_WEIGHT = 1.5  # Rural locations are restocked first
+EXPIRY_HORIZON_DAYS = 90  # Items expiring further out than this carry no expiry urgency
+# poll() re-reads this far behind the high-water mark, because last_updated is set
+# by each client and late or tied writes can land behind documents already seen
+POLL_OVERLAP_SECONDS = 120
+
+def alert_priority(item, today=None):
+    """Score an inventory item; 0 means it needs no alert
+
+    The score adds the stock-deficit ratio below min_threshold and how far the item
+    is into the expiry horizon (1.0 at or past expiry), weighted up for rural locations.
+    """
+    today = today or datetime.utcnow()
+    min_threshold = item.get("min_threshold") or 0
+    deficit_ratio = max(0.0, (min_threshold - item["current_stock"]) / min_threshold) if min_threshold else 0.0
+
+    expiry_urgency = 0.0
+    if item.get("expiry_date"):
+        days_to_expiry = (datetime.strptime(item["expiry_date"], "%Y-%m-%d") - today).days
+        expiry_urgency = min(1.0, max(0.0, 1 - days_to_expiry / EXPIRY_HORIZON_DAYS))
+
+    score = STOCK_WEIGHT * deficit_ratio + EXPIRY_WEIGHT * expiry_urgency
+    if item.get("location_type") == "rural":
+        score *= RURAL_WEIGHT
+    return score
+
+class InventoryAlertEngine:
+    """Max-priority heap of critical inventory items with O(log n) updates
+
+    Updates push a fresh entry and mark the item's previous entry stale; stale
+    entries are discarded lazily when they reach the top of the heap. Expiry
+    urgency rises with time alone, so a second heap keyed on the next day each
+    item's score changes rescores items no document change would touch.
+    """
+
+    def __init__(self, collection=None):
+        if collection is None:
+            collection = get_database().inventory
+        self.collection = collection
+        self._heap = []  # (-score, tiebreak, key)
+        self._entries = {}  # key -> (score, tiebreak, item) for the live entry
+        self._expiry_heap = []  # (rescore_at, tiebreak, key, item)
+        self._scheduled = {}  # key -> tiebreak of the item's live expiry_heap entry
+        self._counter = itertools.count()
+        self.high_water_mark = None  # Latest last_updated seen by poll()
+        self._applied = set()  # (key, last_updated) already applied inside the poll overlap window
+
+    def __len__(self):
+        return len(self._entries)
+
+    def update(self, item, today=None):
+        """Insert or rescore one inventory document"""
+        key = str(item["_id"])
+        today = today or datetime.utcnow()
+        tiebreak = next(self._counter)
+        self._schedule_rescore(key, tiebreak, item, today)
+        score = alert_priority(item, today)
+        if score <= 0:
+            self._entries.pop(key, None)
+        else:
+            self._entries[key] = (score, tiebreak, item)
+            heapq.heappush(self._heap, (-score, tiebreak, key))
+        # Non-critical items still push expiry_heap entries, so both branches compact
+        self._compact()
+
+    def remove(self, key):
+        """Drop an item; its heap entries become stale"""
+        self._entries.pop(str(key), None)
+        self._scheduled.pop(str(key), None)
+
+    def _schedule_rescore(self, key, tiebreak, item, today):
+        """Queue the item for the moment its expiry urgency next changes, if it ever will"""
+        self._scheduled.pop(key, None)
+        if not item.get("expiry_date"):
+            return
+        expiry = datetime.strptime(item["expiry_date"], "%Y-%m-%d")
+        days_to_expiry = (expiry - today).days
+        if days_to_expiry <= 0:
+            return  # Already fully urgent
+        # Urgency is 0 until the item enters the horizon, then rises once a day
+        rescore_at = expiry - timedelta(days=min(days_to_expiry, EXPIRY_HORIZON_DAYS))
+        self._scheduled[key] = tiebreak
+        heapq.heappush(self._expiry_heap, (rescore_at, tiebreak, key, item))
+
+    def refresh_expiry(self, today=None):
+        """Rescore items whose expiry urgency has risen since they were last scored"""
+        today = today or datetime.utcnow()
+        rescored = 0
+        while self._expiry_heap and self._expiry_heap[0][0] < today:
+            _, tiebreak, key, item = heapq.heappop(self._expiry_heap)
+            if self._scheduled.get(key) == tiebreak:
+                self.update(item, today)
+                rescored += 1
+        return rescored
+
+    def _is_live(self, entry):
+        _, tiebreak, key = entry
+        live = self._entries.get(key)
+        return live is not None and live[1] == tiebreak
+
+    def _compact(self):
+        """Rebuild the heap once stale entries outnumber live ones, keeping memory bounded"""
+        if len(self._heap) > 2 * len(self._entries) + 64:
+            self._heap = [entry for entry in self._heap if self._is_live(entry)]
+            heapq.heapify(self._heap)
+        if len(self._expiry_heap) > 2 * len(self._scheduled) + 64:
+            self._expiry_heap = [entry for entry in self._expiry_heap if self._scheduled.get(entry[2]) == entry[1]]
+            heapq.heapify(self._expiry_heap)
+
+    def top(self, n=10):
+        """Get the n most critical items as (score, item), highest priority first"""
+        self.refresh_expiry()
+        popped, results = [], []
+        while self._heap and len(results) < n:
+            entry = heapq.heappop(self._heap)
+            if not self._is_live(entry):
+                continue
+            popped.append(entry)
+            score, _, item = self._entries[entry[2]]
+            results.append((score, item))
+        for entry in popped:
+            heapq.heappush(self._heap, entry)
+        return results
+
+    def load(self):
+        """Score the whole collection once at startup"""
+        for item in self.collection.find():
+            self.update(item)
+            self._advance_high_water(item)
+        self._prune_applied()
+
+    def _advance_high_water(self, item):
+        last_updated = item.get("last_updated")
+        if last_updated:
+            self._applied.add((str(item["_id"]), last_updated))
+        if last_updated and (self.high_water_mark is None or last_updated > self.high_water_mark):
+            self.high_water_mark = last_updated
+
+    def _prune_applied(self):
+        """Forget applied writes that the next poll's overlap window no longer re-reads"""
+        if self.high_water_mark is not None:
+            cutoff = self.high_water_mark - timedelta(seconds=POLL_OVERLAP_SECONDS)
+            self._applied = {applied for applied in self._applied if applied[1] >= cutoff}
+
+    def poll(self):
+        """Apply documents whose last_updated is new or within the overlap window (deletes are not seen)
+
+        Writes already applied are skipped by (_id, last_updated), so re-reading the
+        window only picks up late or tied writes.
+        """
+        query = {}
+        if self.high_water_mark:
+            query = {"last_updated": {"$gte": self.high_water_mark - timedelta(seconds=POLL_OVERLAP_SECONDS)}}
+        changed = 0
+        for item in self.collection.find(query).sort("last_updated", pymongo.ASCENDING):
+            if (str(item["_id"]), item.get("last_updated")) in self._applied:
+                continue
+            self.update(item)
+            self._advance_high_water(item)
+            changed += 1
+        self._prune_applied()
+        return changed
+
+    def apply_change(self, change):
+        """Apply one change-stream event"""
+        if change["operationType"] == "delete":
+            self.remove(change["documentKey"]["_id"])
+        elif change.get("fullDocument") is not None:
+            self.update(change["fullDocument"])
+            self._advance_high_water(change["fullDocument"])
+
+    def watch(self, on_change=None, load=False):
+        """Follow the inventory change stream (needs a replica set); calls on_change after each event
+
+        With load=True the collection is scored only once the stream is open, so
+        changes made while loading are replayed rather than lost.
+        """
+        with self.collection.watch(full_document="updateLookup") as stream:
+            if load:
+                self.load()
+            for change in stream:
+                self.apply_change(change)
+                if on_change:
+                    on_change(self)
+
+    def run(self, poll_interval=30, top_n=10):
+        """Open the change stream, load, then follow changes; falls back to polling last_updated"""
+        try:
+            self.watch(lambda engine: print_alerts(engine, top_n), load=True)
+        except pymongo.errors.OperationFailure:
+            print("ℹ️  Change streams unavailable; polling last_updated instead")
+            while True:  # The first poll loads the whole collection
+                if self.poll() or self.refresh_expiry():
+                    print_alerts(self, top_n)
+                time.sleep(poll_interval)
+
+def print_alerts(engine, top_n=10):
+    """Print the most critical inventory items"""
+    print(f"🚨 Top {top_n} critical inventory items:")
+    for score, item in engine.top(top_n):
+        print(f"   [{score:.2f}] {item['drug_name']} @ {item['location']}: "
+              f"{item['current_stock']}/{item['min_threshold']} units, expires {item.get('expiry_date')}")
+
+if __name__ == "__main__":
+    engine = InventoryAlertEngine()
+    engine.run()
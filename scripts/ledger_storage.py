@@ -0,0 +1,300 @@
+"""
+MedChain Ledger Storage
+Append-only, segmented on-disk block log with memory-mapped reads
+"""
+
+import json
+import mmap
+import os
+import struct
+import zlib
+from typing import Callable, Dict, Iterator, List, Optional
+
+# Index entry: segment number, byte offset within the segment, record length
+INDEX_ENTRY = struct.Struct("<IQI")
+# Record header: payload length, CRC32 of the payload
+RECORD_HEADER = struct.Struct("<II")
+# Block header length, then transaction count
+U32 = struct.Struct("<I")
+# Per-transaction (offset, length) relative to the start of the transaction area
+TX_ENTRY = struct.Struct("<II")
+
+DEFAULT_SEGMENT_SIZE = 64 * 1024 * 1024
+
+def encode_block_record(block_data: Dict) -> bytes:
+    """Serialize a block dict so each transaction can be sliced out on its own.
+
+    Layout: header_len | header JSON | tx_count | tx_count * (offset, length) | tx JSON...
+    """
+    header = {key: value for key, value in block_data.items() if key != "transactions"}
+    header_bytes = json.dumps(header, sort_keys=True).encode()
+    tx_blobs = [json.dumps(tx, sort_keys=True).encode() for tx in block_data["transactions"]]
+
+    tx_table = bytearray()
+    offset = 0
+    for blob in tx_blobs:
+        tx_table += TX_ENTRY.pack(offset, len(blob))
+        offset += len(blob)
+
+    return b"".join([
+        U32.pack(len(header_bytes)), header_bytes,
+        U32.pack(len(tx_blobs)), bytes(tx_table),
+        *tx_blobs
+    ])
+
+class SegmentedBlockLog:
+    """List-like, append-only block store backed by segment files and an offset index.
+
+    Only the fixed-size index is consulted on open, so reopening is independent of
+    chain length. Blocks and single transactions are decoded lazily from mmap views.
+    A read_only log never repairs or appends, so other processes can read a ledger
+    while its owner keeps writing.
+    """
+
+    def __init__(self, directory: str, block_factory: Callable[[Dict], object],
+                 segment_size: int = DEFAULT_SEGMENT_SIZE, fsync: bool = False, read_only: bool = False):
+        self.directory = directory
+        self.block_factory = block_factory
+        self.segment_size = segment_size
+        self.fsync = fsync
+        self.read_only = read_only
+        if not read_only:
+            os.makedirs(directory, exist_ok=True)
+
+        self._index_path = os.path.join(directory, "index.bin")
+        self._index_file = open(self._index_path, "rb" if read_only else "a+b")
+        self._count = os.path.getsize(self._index_path) // INDEX_ENTRY.size
+        self._index_map: Optional[mmap.mmap] = None
+        self._segment_maps: Dict[int, mmap.mmap] = {}
+        self._latest = None
+
+        if read_only:
+            self._active_segment, self._active_file = None, None
+        else:
+            self._index_file.truncate(self._count * INDEX_ENTRY.size)  # Drop a torn index entry
+            self._open_active_segment()
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"segment-{segment:06d}.log")
+
+    def _open_active_segment(self):
+        """Open the last segment for appends, discarding bytes past the last indexed record"""
+        if self._count:
+            segment, offset, length = self._read_index(self._count - 1)
+            end = offset + length
+        else:
+            segment, end = 0, 0
+
+        # A crash during rollover can leave unindexed records in later segments
+        for name in os.listdir(self.directory):
+            if name.startswith("segment-") and name.endswith(".log") and int(name[8:-4]) > segment:
+                os.remove(os.path.join(self.directory, name))
+
+        self._active_segment = segment
+        self._active_file = open(self._segment_path(segment), "a+b")
+        if os.path.getsize(self._segment_path(segment)) != end:
+            self._active_file.truncate(end)
+        self._active_size = end
+
+    def _read_index(self, position: int):
+        """Read one (segment, offset, length) entry from the memory-mapped index"""
+        start = position * INDEX_ENTRY.size
+        if self._index_map is None or len(self._index_map) < start + INDEX_ENTRY.size:
+            self._index_file.flush()
+            self._index_map = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+        return INDEX_ENTRY.unpack_from(self._index_map, start)
+
+    def _segment_view(self, segment: int, end: int) -> mmap.mmap:
+        """Get a read-only mmap of a segment covering at least end bytes"""
+        view = self._segment_maps.get(segment)
+        if view is None or len(view) < end:
+            # Stale maps are dropped rather than closed; outstanding slices keep them alive
+            if segment == self._active_segment:
+                self._active_file.flush()
+            with open(self._segment_path(segment), "rb") as f:
+                view = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._segment_maps[segment] = view
+        return view
+
+    def _record(self, position: int) -> memoryview:
+        """Get the verified payload of the block record at position"""
+        segment, offset, length = self._read_index(position)
+        view = memoryview(self._segment_view(segment, offset + length))
+        payload_length, checksum = RECORD_HEADER.unpack_from(view, offset)
+        payload = view[offset + RECORD_HEADER.size:offset + RECORD_HEADER.size + payload_length]
+        if zlib.crc32(payload) != checksum:
+            raise IOError(f"Checksum mismatch in block record {position}")
+        return payload
+
+    def _normalize(self, position: int) -> int:
+        if position < 0:
+            position += self._count
+        if not 0 <= position < self._count:
+            raise IndexError("block index out of range")
+        return position
+
+    def append(self, block):
+        """Append a sealed block to the active segment and record its offset"""
+        if self.read_only:
+            raise IOError("Block log is open read-only")
+        payload = encode_block_record(block.to_dict())
+        record = RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+        if self._active_size and self._active_size + len(record) > self.segment_size:
+            self._active_file.close()
+            self._active_segment += 1
+            self._active_file = open(self._segment_path(self._active_segment), "a+b")
+            self._active_file.truncate(0)  # Records start at offset 0, whatever a crash left behind
+            self._active_size = 0
+
+        offset = self._active_size
+        self._active_file.write(record)
+        self._active_file.flush()
+        if self.fsync:
+            os.fsync(self._active_file.fileno())
+        self._active_size += len(record)
+
+        # The index entry is written last, so a crash never indexes a partial record
+        self._index_file.write(INDEX_ENTRY.pack(self._active_segment, offset, len(record)))
+        self._index_file.flush()
+        if self.fsync:
+            os.fsync(self._index_file.fileno())
+
+        self._count += 1
+        self._latest = block
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, position: int):
+        position = self._normalize(position)
+        if position == self._count - 1 and self._latest is not None:
+            return self._latest
+
+        payload = self._record(position)
+        header_length = U32.unpack_from(payload, 0)[0]
+        block_data = json.loads(bytes(payload[U32.size:U32.size + header_length]))
+        block_data["transactions"] = self._decode_transactions(payload, header_length)
+        block = self.block_factory(block_data)
+        if position == self._count - 1:
+            self._latest = block
+        return block
+
+    def __iter__(self) -> Iterator:
+        for position in range(self._count):
+            yield self[position]
+
+    def read_header(self, position: int) -> Dict:
+        """Decode a block's header fields (everything but its transactions)"""
+        payload = self._record(self._normalize(position))
+        header_length = U32.unpack_from(payload, 0)[0]
+        return json.loads(bytes(payload[U32.size:U32.size + header_length]))
+
+    def _tx_area(self, payload: memoryview, header_length: int):
+        """Locate the transaction table and the start of the transaction bytes"""
+        count_at = U32.size + header_length
+        tx_count = U32.unpack_from(payload, count_at)[0]
+        table_at = count_at + U32.size
+        return tx_count, table_at, table_at + tx_count * TX_ENTRY.size
+
+    def _decode_transactions(self, payload: memoryview, header_length: int) -> List[Dict]:
+        tx_count, table_at, data_at = self._tx_area(payload, header_length)
+        transactions = []
+        for i in range(tx_count):
+            offset, length = TX_ENTRY.unpack_from(payload, table_at + i * TX_ENTRY.size)
+            transactions.append(json.loads(bytes(payload[data_at + offset:data_at + offset + length])))
+        return transactions
+
+    def transaction_count(self, block_index: int) -> int:
+        """Get the number of transactions in a block without decoding them"""
+        payload = self._record(self._normalize(block_index))
+        header_length = U32.unpack_from(payload, 0)[0]
+        return self._tx_area(payload, header_length)[0]
+
+    def read_transaction(self, block_index: int, tx_index: int) -> Dict:
+        """Decode a single transaction straight from the mmap without loading its block"""
+        payload = self._record(self._normalize(block_index))
+        header_length = U32.unpack_from(payload, 0)[0]
+        tx_count, table_at, data_at = self._tx_area(payload, header_length)
+        if not 0 <= tx_index < tx_count:
+            raise IndexError("transaction index out of range")
+
+        offset, length = TX_ENTRY.unpack_from(payload, table_at + tx_index * TX_ENTRY.size)
+        return json.loads(bytes(payload[data_at + offset:data_at + offset + length]))
+
+    def close(self):
+        """Flush and release all files and memory maps"""
+        for view in self._segment_maps.values():
+            view.close()
+        self._segment_maps.clear()
+        if self._index_map is not None:
+            self._index_map.close()
+            self._index_map = None
+        if self._active_file is not None:
+            self._active_file.close()
+        self._index_file.close()
+
+class BlockIndexLog:
+    """Append-only JSON-lines sidecar holding one line of secondary-index entries per block.
+
+    Appending costs one write, and the file is read only when the indexes are first
+    queried, so reopening a ledger never decodes its blocks.
+    """
+
+    def __init__(self, path: str, fsync: bool = False):
+        self.path = path
+        self.fsync = fsync
+        self._file = open(path, "a+b")
+        self.count = self._recover()
+
+    def _newline_before(self, end: int) -> int:
+        """Get the offset just past the last newline before end, or 0"""
+        while end > 0:
+            start = max(0, end - 4096)
+            self._file.seek(start)
+            at = self._file.read(end - start).rfind(b"\n")
+            if at >= 0:
+                return start + at + 1
+            end = start
+        return 0
+
+    def _recover(self) -> int:
+        """Drop a torn last line and return how many blocks the log covers"""
+        size = self._file.seek(0, os.SEEK_END)
+        end = self._newline_before(size)
+        if end != size:
+            self._file.truncate(end)
+        if not end:
+            return 0
+
+        start = self._newline_before(end - 1)
+        self._file.seek(start)
+        try:
+            return json.loads(self._file.read(end - start))[0] + 1
+        except ValueError:
+            self.reset()  # Unreadable; the owner rebuilds it from the blocks
+            return 0
+
+    def append(self, block_index: int, entries: List):
+        """Record the index entries of one block; blocks must be appended in order"""
+        self._file.write(json.dumps([block_index, entries]).encode() + b"\n")
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.count = block_index + 1
+
+    def __iter__(self) -> Iterator:
+        """Yield (block_index, entries) for every recorded block, oldest first"""
+        self._file.flush()
+        with open(self.path, "rb") as f:
+            for line in f:
+                block_index, entries = json.loads(line)
+                yield block_index, entries
+
+    def reset(self):
+        """Discard every entry"""
+        self._file.truncate(0)
+        self.count = 0
+
+    def close(self):
+        self._file.close()
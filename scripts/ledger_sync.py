@@ -0,0 +1,196 @@
+"""
+MedChain Ledger Sync
+Anchors sealed blocks in MongoDB with one batched write per collection per block
+"""
+
+import queue
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+
+from blockchain_simulator import Block, MedChainBlockchain
+from data_access import get_database, invalidate_batch
+
+# Audit log action names, matching the admin panel
+AUDIT_ACTIONS = {
+    "CREATE_BATCH": "Drug Batch Created"
+}
+
+# Batch fields copied from CREATE_BATCH transactions onto drug_batches documents
+BATCH_FIELDS = ["drug_name", "manufacturer", "quantity", "manufacture_date", "expiry_date", "origin", "qr_code"]
+
+def _anchor(transaction: Dict, block: Block) -> Dict:
+    """Fields tying a document to the transaction and block that recorded it"""
+    return {
+        "blockchain_tx_id": transaction["transaction_id"],
+        "blockchain_tx_seq": transaction_sequence(transaction["transaction_id"]),
+        "block_hash": block.hash,
+        "block_index": block.index
+    }
+
+def transaction_sequence(transaction_id: str) -> int:
+    """The Snowflake number behind a transaction ID, which orders transactions by creation time
+
+    Unlike block indexes, it keeps growing across chains, so a chain restarted from
+    genesis still sorts after every transaction anchored by an earlier run.
+    """
+    return int(transaction_id.rsplit("-", 1)[-1])
+
+def _not_newer_than(sequence: int) -> Dict:
+    """Aggregation test that the stored document was anchored by this or an older transaction"""
+    return {"$lte": [{"$ifNull": ["$blockchain_tx_seq", -1]}, sequence]}
+
+def batch_operations(block: Block) -> List[UpdateOne]:
+    """Upserts for the block's CREATE_BATCH transactions, keyed on batch_id
+
+    Each update is a pipeline that only applies its fields when the stored document
+    was anchored by the same or an earlier transaction, so replaying an old block
+    after a newer one never rolls a re-created batch back to stale values.
+    """
+    operations = []
+    for transaction in block.transactions:
+        if transaction.get("type") != "CREATE_BATCH":
+            continue
+        fields = {field: transaction[field] for field in BATCH_FIELDS if transaction.get(field) is not None}
+        fields.update(_anchor(transaction, block))
+        newer = _not_newer_than(fields["blockchain_tx_seq"])
+        stage = {field: {"$cond": [newer, {"$literal": value}, f"${field}"]} for field, value in fields.items()}
+        # Set only on insert, as $setOnInsert would outside a pipeline
+        stage["status"] = {"$ifNull": ["$status", "active"]}
+        created_at = datetime.fromisoformat(transaction["timestamp"])
+        stage["created_at"] = {"$ifNull": ["$created_at", {"$literal": created_at}]}
+        if "qr_code" not in fields:
+            stage["qr_code"] = {"$ifNull": ["$qr_code", f"QR-{transaction['batch_id']}"]}  # Deterministic, so replays match
+        operations.append(UpdateOne({"batch_id": transaction["batch_id"]}, [{"$set": stage}], upsert=True))
+    return operations
+
+def audit_operations(block: Block) -> List[UpdateOne]:
+    """Insert-once audit entries for every transaction in the block, keyed on transaction_id"""
+    operations = []
+    for transaction in block.transactions:
+        entry = {
+            "transaction_id": transaction["transaction_id"],
+            "action": AUDIT_ACTIONS.get(transaction.get("type"), transaction.get("type")),
+            "actor": transaction.get("manufacturer"),
+            "batch_id": transaction.get("batch_id"),
+            "drug_name": transaction.get("drug_name"),
+            "quantity": transaction.get("quantity"),
+            "status": "success",
+            "created_at": datetime.fromisoformat(transaction["timestamp"])
+        }
+        entry.update(_anchor(transaction, block))
+        operations.append(UpdateOne({"transaction_id": entry["transaction_id"]}, {"$setOnInsert": entry}, upsert=True))
+    return operations
+
+class MongoLedgerSync:
+    """Block listener that writes each sealed block to drug_batches and audit_logs
+
+    Blocks are queued and written by a background thread, so sealing never waits on
+    MongoDB or on retry backoff. Every write is an upsert keyed on batch_id or
+    transaction_id and guarded on transaction order, so a block can be replayed after a
+    partial failure, or after newer blocks, without duplicating or staling documents.
+    """
+
+    def __init__(self, db=None, max_retries: int = 3, retry_delay: float = 0.5):
+        self.db = db if db is not None else get_database()
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.failed_blocks: List[Block] = []  # Blocks still unsynced after every retry
+        self.synced_blocks = 0
+        # Guards failed_blocks and synced_blocks, which the writer thread updates while callers retry
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue()
+        self._worker = threading.Thread(target=self._run, name="mongo-ledger-sync", daemon=True)
+        self._worker.start()
+
+    def __call__(self, block: Block):
+        """Queue a sealed block for the background writer"""
+        self._queue.put(block)
+
+    def _run(self):
+        while True:
+            block = self._queue.get()
+            try:
+                if block is None:
+                    return
+                self.sync_block(block)
+            except Exception as error:
+                print(f"⚠️  Block {block.index} not synced to MongoDB: {error}")
+                self._record_failure(block)
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Wait until every queued block has been written or given up on"""
+        self._queue.join()
+
+    def close(self):
+        """Write the remaining queued blocks and stop the background writer"""
+        self._queue.put(None)
+        self._worker.join()
+
+    def _write_block(self, block: Block):
+        """Send the block's writes as one unordered bulk_write per collection"""
+        batches = batch_operations(block)
+        if batches:
+            self.db.drug_batches.bulk_write(batches, ordered=False)
+            for transaction in block.transactions:
+                if transaction.get("type") == "CREATE_BATCH":
+                    invalidate_batch(transaction["batch_id"],
+                                     transaction.get("qr_code") or f"QR-{transaction['batch_id']}", db=self.db)
+        audits = audit_operations(block)
+        if audits:
+            self.db.audit_logs.bulk_write(audits, ordered=False)
+
+    def sync_block(self, block: Block) -> bool:
+        """Write a block, retrying with exponential backoff; returns False once retries run out"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                self._write_block(block)
+                with self._lock:
+                    self.synced_blocks += 1
+                return True
+            except PyMongoError as error:
+                if attempt == self.max_retries:
+                    print(f"⚠️  Block {block.index} not synced to MongoDB: {error}")
+                    self._record_failure(block)
+                    return False
+                time.sleep(self.retry_delay * 2 ** attempt)
+
+    def _record_failure(self, block: Block):
+        with self._lock:
+            self.failed_blocks.append(block)
+
+    def retry_failed(self) -> int:
+        """Replay blocks that previously failed to sync; returns how many succeeded"""
+        with self._lock:
+            blocks, self.failed_blocks = self.failed_blocks, []
+        return sum(self.sync_block(block) for block in blocks)
+
+    def backfill(self, blockchain: MedChainBlockchain) -> int:
+        """Sync every block already on a chain, e.g. after reopening an on-disk ledger"""
+        return sum(self.sync_block(block) for block in blockchain.chain if block.transactions)
+
+def attach_ledger_sync(blockchain: MedChainBlockchain, db=None, **kwargs) -> MongoLedgerSync:
+    """Anchor every block the chain seals from now on in MongoDB"""
+    sync = MongoLedgerSync(db, **kwargs)
+    blockchain.add_block_listener(sync)
+    return sync
+
+if __name__ == "__main__":
+    blockchain = MedChainBlockchain()
+    sync = attach_ledger_sync(blockchain)
+    blockchain.create_drug_batch({
+        "batch_id": "BATCH-DEMO-0001",
+        "drug_name": "Paracetamol 500mg",
+        "manufacturer": "Sun Pharma",
+        "quantity": 1000,
+        "origin": "Hyderabad"
+    })
+    blockchain.mine_pending_transactions()
+    sync.close()
+    print(f"🔗 Synced {sync.synced_blocks} block(s), {len(sync.failed_blocks)} pending retry")
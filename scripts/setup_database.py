@@ -3,25 +3,70 @@ MedChain Database Setup Script
 Creates MongoDB collections and sample data for the MVP
 """
 
-import pymongo
+from pymongo import ASCENDING, DESCENDING, IndexModel
 import hashlib
 import json
 from datetime import datetime, timedelta
 import random
 
-# MongoDB connection (replace with your MongoDB Atlas connection string)
-MONGODB_URI = "mongodb://localhost:27017/"  # Local MongoDB for demo
-DATABASE_NAME = "medchain_mvp"
+from data_access import DATABASE_NAME, MANUFACTURER_LOCATION_MAP, get_database
 
-# Manufacturer to Origin Location Mapping
-MANUFACTURER_LOCATION_MAP = {
-    "Dr. Reddy's": ["Mumbai", "Chennai"],
-    "Sun Pharma": ["Hyderabad", "Ahmedabad"],
-    "Cipla Ltd": ["Goa", "Bangalore"],
-    "Lupin Ltd": ["Pune", "Aurangabad"],
-    "Aurobindo Pharma": ["Hyderabad", "Vizag"]
+# Audit log entries expire after this many days
+AUDIT_LOG_RETENTION_DAYS = 365
+
+# Declarative index specification per collection
+COLLECTION_INDEXES = {
+    "drug_batches": [
+        IndexModel([("batch_id", ASCENDING)], name="batch_id_unique", unique=True),
+        IndexModel([("qr_code", ASCENDING)], name="qr_code_unique", unique=True),
+        IndexModel([("manufacturer", ASCENDING), ("drug_name", ASCENDING)], name="manufacturer_drug")
+    ],
+    "scan_records": [
+        IndexModel([("qr_code", ASCENDING), ("scanned_at", DESCENDING)], name="qr_code_scanned_at"),
+        IndexModel([("batch_id", ASCENDING), ("scanned_at", DESCENDING)], name="batch_id_scanned_at")
+    ],
+    "inventory": [
+        IndexModel([("location", ASCENDING), ("drug_name", ASCENDING)], name="location_drug"),
+        # get_low_stock_items compares current_stock to min_threshold with $expr, which no index
+        # can serve; this narrows it to one location type and the rest is a filtered fetch
+        IndexModel([("location_type", ASCENDING)], name="location_type"),
+        IndexModel([("expiry_date", ASCENDING)], name="expiry_date"),
+        IndexModel([("last_updated", ASCENDING)], name="last_updated")
+    ],
+    "patients": [
+        IndexModel([("aadhaar_id", ASCENDING)], name="aadhaar_id_unique", unique=True),
+        IndexModel([("patient_id", ASCENDING)], name="patient_id_unique", unique=True)
+    ],
+    "dispensing_records": [
+        IndexModel([("patient_id", ASCENDING), ("dispensed_at", DESCENDING)], name="patient_dispensed_at"),
+        IndexModel([("batch_id", ASCENDING)], name="batch_id")
+    ],
+    "audit_logs": [
+        IndexModel([("created_at", ASCENDING)], name="created_at_ttl",
+                   expireAfterSeconds=AUDIT_LOG_RETENTION_DAYS * 24 * 3600),
+        # Ledger sync upserts on transaction_id; older entries without one are left out
+        IndexModel([("transaction_id", ASCENDING)], name="transaction_id_unique", unique=True,
+                   partialFilterExpression={"transaction_id": {"$exists": True}})
+    ],
+    "dummy_numbers": [
+        IndexModel([("dummy_number", ASCENDING)], name="dummy_number_unique", unique=True),
+        # Only unused numbers are ever looked up, so used ones are left out of the index
+        IndexModel([("patient_id", ASCENDING)], name="unused_by_patient",
+                   partialFilterExpression={"used": False})
+    ],
+    "demand_history": [
+        IndexModel([("drug_name", ASCENDING), ("region", ASCENDING), ("year", ASCENDING), ("month", ASCENDING)],
+                   name="drug_region_period")
+    ]
 }
 
+def create_indexes(db):
+    """Provision every index in COLLECTION_INDEXES (existing identical indexes are left as is)"""
+    created = {}
+    for collection, indexes in COLLECTION_INDEXES.items():
+        created[collection] = db[collection].create_indexes(indexes)
+    return created
+
 def hash_passcode(passcode):
     """Hash admin passcode for security"""
     return hashlib.sha256(passcode.encode()).hexdigest()
@@ -37,9 +82,8 @@ def generate_dummy_numbers():
 def setup_database():
     """Initialize MongoDB collections with sample data"""
     
-    # Connect to MongoDB
-    client = pymongo.MongoClient(MONGODB_URI)
-    db = client[DATABASE_NAME]
+    # Connect to MongoDB through the shared pooled client
+    db = get_database()
     
     # Clear existing collections
     collections = ['drug_batches', 'scan_records', 'inventory', 'patients', 'dispensing_records', 'audit_logs', 'dummy_numbers']
@@ -222,12 +266,16 @@ def setup_database():
     
     db.demand_history.insert_many(demand_data)
     
+    # 6. Indexes for QR, Aadhaar and inventory lookups
+    indexes = create_indexes(db)
+    
     print("✅ Database setup completed successfully!")
     print(f"📊 Created {len(drug_batches)} drug batches with manufacturer-location mapping")
     print(f"👥 Created {len(patients)} patient records with random Aadhaar IDs")
     print(f"🆘 Created {len(dummy_numbers)} emergency dummy numbers")
     print(f"📦 Created {len(inventory_items)} inventory items")
     print(f"📈 Created {len(demand_data)} demand history records")
+    print(f"🗂️  Created {sum(len(names) for names in indexes.values())} indexes")
     
     # Print connection info
     print(f"\n🔗 Database: {DATABASE_NAME}")
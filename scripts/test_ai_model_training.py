@@ -0,0 +1,24 @@
+"""
+MedChain AI Model Training Tests
+Synthetic training data generation
+"""
+
+import pytest
+
+pytest.importorskip("sklearn")
+
+from ai_model_training import generate_training_data, iter_training_chunks
+
+def test_chunks_reproduce_the_full_dataset():
+    full = generate_training_data(samples_per_cell=2)
+    chunks = list(iter_training_chunks(samples_per_cell=2, chunk_rows=500))
+    assert [len(chunk) for chunk in chunks] == [500, 500, 440]
+    assert sum(chunk['demand'].sum() for chunk in chunks) == full['demand'].sum()
+
+@pytest.mark.parametrize("dimension", [{"years": ()}, {"months": []}, {"samples_per_cell": 0}])
+def test_empty_dimension_gives_an_empty_frame_with_the_full_schema(dimension):
+    full = generate_training_data()
+    empty = generate_training_data(**dimension)
+    assert empty.empty
+    assert list(empty.columns) == list(full.columns)
+    assert (empty.dtypes == full.dtypes).all()
@@ -0,0 +1,320 @@
+"""
+MedChain Blockchain Simulator Tests
+Merkle proofs, block cutting, transaction IDs and chain validation
+"""
+
+import os
+import threading
+import time
+
+import pytest
+
+import blockchain_simulator
+from blockchain_simulator import (NODE_ID_BITS, SEQUENCE_BITS, ConsensusEngine, MedChainBlockchain,
+                                  OrderingServiceConsensus, ProofOfWorkConsensus, TransactionIdGenerator,
+                                  _hash_leaf, _hash_pair, compute_merkle_proof, compute_merkle_root,
+                                  get_id_generator, hash_transaction, verify_merkle_proof)
+
+def leaves(count):
+    return [hash_transaction({"transaction_id": f"TX-{i}"}) for i in range(count)]
+
+def test_duplicated_last_leaf_changes_the_root():
+    a, b, c = leaves(3)
+    assert compute_merkle_root([a, b, c]) != compute_merkle_root([a, b, c, c])
+    assert compute_merkle_root([a, b]) != compute_merkle_root([a, b, b])
+
+def test_single_leaf_root_is_not_the_transaction_hash():
+    (a,) = leaves(1)
+    assert compute_merkle_root([a]) != a
+
+def test_internal_node_is_not_accepted_as_a_leaf():
+    a, b, c, d = leaves(4)
+    left = _hash_pair(_hash_leaf(a), _hash_leaf(b))
+    right = _hash_pair(_hash_leaf(c), _hash_leaf(d))
+    assert not verify_merkle_proof(left, [(right, "right")], compute_merkle_root([a, b, c, d]))
+
+@pytest.mark.parametrize("count", [1, 2, 3, 5, 7, 9])
+def test_proofs_round_trip(count):
+    leaf_hashes = leaves(count)
+    root = compute_merkle_root(leaf_hashes)
+    for index, leaf_hash in enumerate(leaf_hashes):
+        proof = compute_merkle_proof(leaf_hashes, index)
+        assert verify_merkle_proof(leaf_hash, proof, root)
+        assert not verify_merkle_proof(leaf_hashes[index - 1] if count > 1 else "0" * 64, proof, root)
+
+def test_polling_does_not_postpone_the_batch_timeout():
+    blockchain = MedChainBlockchain(max_batch_size=100, batch_timeout=0.3)
+    blockchain.add_transaction({"type": "TEST"})
+    deadline = time.monotonic() + 1.0
+    while blockchain.pending_transactions and time.monotonic() < deadline:
+        blockchain.mine_pending_transactions(force=False)
+        time.sleep(0.05)
+    assert not blockchain.pending_transactions
+    assert len(blockchain.chain) == 2
+
+def test_timer_cuts_a_lone_transaction():
+    blockchain = MedChainBlockchain(max_batch_size=100, batch_timeout=0.1)
+    blockchain.add_transaction({"type": "TEST"})
+    time.sleep(0.4)
+    assert len(blockchain.chain) == 2
+
+def test_unforced_mining_waits_without_max_batch_size():
+    blockchain = MedChainBlockchain()
+    blockchain.add_transaction({"type": "TEST"})
+    assert blockchain.mine_pending_transactions(force=False) is None
+    assert len(blockchain.pending_transactions) == 1
+    assert blockchain.mine_pending_transactions() is not None
+    assert not blockchain.pending_transactions
+
+def test_consensus_engine_is_abstract():
+    with pytest.raises(TypeError):
+        ConsensusEngine()
+
+def test_ordering_service_has_no_difficulty():
+    blockchain = MedChainBlockchain(OrderingServiceConsensus(signing_key=b"test-key"))
+    with pytest.raises(AttributeError):
+        blockchain.difficulty = 3
+    assert blockchain.difficulty == 0
+
+def snowflake(transaction_id):
+    return int(transaction_id[len("TX-"):])
+
+def test_transaction_ids_are_unique_and_increasing_across_threads():
+    generator = TransactionIdGenerator(node_id=7)
+    ids = [[] for _ in range(4)]
+    threads = [threading.Thread(target=lambda out: out.extend(generator.next_id() for _ in range(5000)), args=(out,))
+               for out in ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    all_ids = [transaction_id for out in ids for transaction_id in out]
+    assert len(set(all_ids)) == len(all_ids)
+    for out in ids:
+        assert [snowflake(i) for i in out] == sorted(snowflake(i) for i in out)
+    assert all((snowflake(i) >> SEQUENCE_BITS) & ((1 << NODE_ID_BITS) - 1) == 7 for i in all_ids)
+
+def test_exhausted_sequence_moves_to_the_next_millisecond():
+    generator = TransactionIdGenerator(node_id=1)
+    generator._last_ms = int(time.time() * 1000) + 60_000  # Ahead of real time, so the clock stays put
+    ids = [snowflake(generator.next_id()) for _ in range(1 << SEQUENCE_BITS)]
+    assert len(set(ids)) == len(ids)
+    assert ids == sorted(ids)
+    assert ids[-1] >> (NODE_ID_BITS + SEQUENCE_BITS) == generator._last_ms
+
+def test_chains_in_one_process_never_share_transaction_ids():
+    first, second = MedChainBlockchain(), MedChainBlockchain()
+    assert first.id_generator is second.id_generator
+    ids = [chain.add_transaction({"type": "TEST"}) for _ in range(2000) for chain in (first, second)]
+    assert len(set(ids)) == len(ids)
+    assert get_id_generator(5) is get_id_generator(5 + (1 << NODE_ID_BITS))
+
+def test_caller_mutation_after_submit_does_not_change_the_block():
+    blockchain = MedChainBlockchain()
+    transaction = {"type": "TEST", "details": {"quantity": 10}}
+    blockchain.add_transaction(transaction)
+    transaction["details"]["quantity"] = 999
+    blockchain.mine_pending_transactions()
+
+    block = blockchain.get_latest_block()
+    assert block.transactions[0]["details"]["quantity"] == 10
+    assert blockchain.validate_chain(workers=1)["valid"]
+
+SIGNING_KEY = b"test-orderer-key"
+
+def stored_chain(directory, blocks=20, transactions=10):
+    blockchain = MedChainBlockchain(OrderingServiceConsensus(signing_key=SIGNING_KEY), storage_dir=str(directory))
+    for block in range(blocks):
+        blockchain.commit_transactions([{"type": "TEST", "block": block, "i": i} for i in range(transactions)])
+    blockchain.close()
+    return MedChainBlockchain(OrderingServiceConsensus(signing_key=SIGNING_KEY), storage_dir=str(directory))
+
+def test_on_disk_validation_hashes_each_transaction_once(tmp_path, monkeypatch):
+    blockchain = stored_chain(tmp_path)
+    calls = []
+    monkeypatch.setattr(blockchain_simulator, "hash_transaction",
+                        lambda transaction: calls.append(1) or hash_transaction(transaction))
+
+    report = blockchain.validate_chain(workers=1, use_checkpoint=False)
+    assert report["valid"]
+    assert len(calls) == 20 * 10
+    blockchain.close()
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_corrupt_record_is_reported_as_first_invalid_block(tmp_path, workers):
+    blockchain = stored_chain(tmp_path)
+    blockchain.close()
+    segment = tmp_path / sorted(name for name in os.listdir(tmp_path) if name.startswith("segment-"))[0]
+    data = bytearray(segment.read_bytes())
+    data[len(data) // 2] ^= 0xFF
+    segment.write_bytes(bytes(data))
+
+    blockchain = MedChainBlockchain(OrderingServiceConsensus(signing_key=SIGNING_KEY), storage_dir=str(tmp_path))
+    report = blockchain.validate_chain(workers=workers, use_checkpoint=False)
+    assert not report["valid"]
+    assert 0 < report["first_invalid_index"] < len(blockchain.chain)
+    assert "Checksum mismatch" in report["reason"]
+    blockchain.close()
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_tampered_transaction_is_found(workers):
+    blockchain = MedChainBlockchain(OrderingServiceConsensus(signing_key=SIGNING_KEY))
+    for block in range(12):
+        blockchain.commit_transactions([{"type": "TEST", "block": block}])
+    blockchain.chain[7].transactions[0]["block"] = 99
+
+    report = blockchain.validate_chain(workers=workers)
+    assert report["first_invalid_index"] == 7
+    assert report["reason"] == "transactions do not match merkle root"
+
+def test_resubmitted_batch_is_listed_once_per_manufacturer():
+    blockchain = MedChainBlockchain()
+    for i in range(5):
+        blockchain.create_drug_batch({"batch_id": f"B{i % 2}", "drug_name": "Paracetamol 500mg",
+                                      "manufacturer": "Sun Pharma", "quantity": 100})
+    blockchain.mine_pending_transactions()
+    assert blockchain.get_manufacturer_batches("Sun Pharma") == ["B0", "B1"]
+    assert len(blockchain.get_batch_history("B0")) == 3
+
+class FailingOnceConsensus(OrderingServiceConsensus):
+    def __init__(self):
+        super().__init__(signing_key=SIGNING_KEY)
+        self.failures = 0
+
+    def seal(self, block):
+        if block.index > 0 and not self.failures:
+            self.failures += 1
+            raise IOError("disk full")
+        super().seal(block)
+
+def test_failed_seal_keeps_the_batch_pending():
+    blockchain = MedChainBlockchain(FailingOnceConsensus())
+    blockchain.add_transaction({"type": "TEST"})
+    with pytest.raises(IOError):
+        blockchain.mine_pending_transactions()
+    assert len(blockchain.pending_transactions) == 1
+    assert len(blockchain.chain) == 1
+
+    blockchain.mine_pending_transactions()
+    assert not blockchain.pending_transactions
+    assert len(blockchain.chain) == 2
+
+def test_timer_retries_a_failed_cut():
+    blockchain = MedChainBlockchain(FailingOnceConsensus(), max_batch_size=100, batch_timeout=0.1)
+    blockchain.add_transaction({"type": "TEST"})
+    time.sleep(0.6)
+    assert not blockchain.pending_transactions
+    assert len(blockchain.chain) == 2
+
+def test_raising_difficulty_keeps_earlier_blocks_valid():
+    blockchain = MedChainBlockchain()
+    blockchain.commit_transactions([{"type": "TEST"}])
+    blockchain.difficulty = 3
+    blockchain.commit_transactions([{"type": "TEST"}])
+    assert [block.difficulty for block in blockchain.chain] == [2, 2, 3]
+    assert blockchain.validate_chain(workers=1, use_checkpoint=False)["valid"]
+
+def test_stored_blocks_keep_their_difficulty(tmp_path):
+    blockchain = MedChainBlockchain(storage_dir=str(tmp_path))
+    blockchain.difficulty = 1
+    blockchain.commit_transactions([{"type": "TEST"}])
+    blockchain.close()
+
+    blockchain = MedChainBlockchain(ProofOfWorkConsensus(difficulty=2, min_difficulty=1), storage_dir=str(tmp_path))
+    assert [block.difficulty for block in blockchain.chain] == [2, 1]
+    assert blockchain.validate_chain(workers=1, use_checkpoint=False)["valid"]
+    blockchain.close()
+
+def test_stored_blocks_below_the_minimum_difficulty_are_rejected(tmp_path):
+    blockchain = MedChainBlockchain(storage_dir=str(tmp_path))
+    blockchain.difficulty = 1
+    blockchain.commit_transactions([{"type": "TEST"}])
+    blockchain.close()
+
+    blockchain = MedChainBlockchain(storage_dir=str(tmp_path))
+    report = blockchain.validate_chain(workers=1, use_checkpoint=False)
+    assert report["first_invalid_index"] == 1
+    blockchain.close()
+
+def test_chain_forged_at_difficulty_zero_fails_validation():
+    blockchain = MedChainBlockchain()
+    for block in range(5):
+        blockchain.commit_transactions([{"type": "TEST", "block": block}])
+
+    # Rewrite block 2 and rehash it and every later block with no proof of work
+    blockchain.chain[2].transactions[0]["block"] = 99
+    for block in blockchain.chain[2:]:
+        block.difficulty = 0
+        block.nonce = 0
+        block.previous_hash = blockchain.chain[block.index - 1].hash
+        block.transaction_hashes = [hash_transaction(tx) for tx in block.transactions]
+        block.merkle_root = compute_merkle_root(block.transaction_hashes)
+        block.header_prefix = block._build_header_prefix()
+        block.hash = block.calculate_hash()
+
+    report = blockchain.validate_chain(workers=1, use_checkpoint=False)
+    assert not report["valid"]
+    assert report["first_invalid_index"] == 2
+    assert report["reason"] == "invalid proof-of-work seal"
+
+def test_lowering_a_stored_difficulty_breaks_the_seal():
+    blockchain = MedChainBlockchain()
+    blockchain.chain[0].difficulty = 0
+    report = blockchain.validate_chain(workers=1, use_checkpoint=False)
+    assert report["first_invalid_index"] == 0
+    assert report["reason"] == "invalid proof-of-work seal"
+
+def test_parallel_mining_finds_a_valid_seal():
+    block = blockchain_simulator.Block(1, [{"type": "TEST"}], "0" * 64)
+    block.mine_block(difficulty=3, workers=2)
+    assert block.hash == block.calculate_hash()
+    assert block.hash.startswith("000")
+
+    block = blockchain_simulator.Block(2, [{"type": "TEST"}], block.hash)
+    block.mine_block(difficulty=3, workers=2)  # Reuses the same worker processes
+    assert block.hash == block.calculate_hash()
+    assert block.hash.startswith("000")
+
+def test_parallel_mining_raises_when_every_worker_dies(monkeypatch):
+    def failing_worker(jobs, results, current_job):
+        jobs.get()
+        raise MemoryError("worker killed")
+
+    monkeypatch.setattr(blockchain_simulator, "_mine_worker", failing_worker)
+    miner = blockchain_simulator.ParallelMiner(2)
+    try:
+        with pytest.raises(RuntimeError, match="All mining workers exited"):
+            miner.mine(b"header|", 3)
+    finally:
+        miner.close()
+
+def test_torn_checkpoint_falls_back_to_full_validation(tmp_path):
+    blockchain = stored_chain(tmp_path, blocks=3)
+    assert blockchain.validate_chain(workers=1, update_checkpoint=True)["valid"]
+    blockchain.close()
+    checkpoint = tmp_path / "checkpoint.json"
+    checkpoint.write_text(checkpoint.read_text()[:10])
+
+    blockchain = MedChainBlockchain(OrderingServiceConsensus(signing_key=SIGNING_KEY), storage_dir=str(tmp_path))
+    assert blockchain.checkpoint is None
+    report = blockchain.validate_chain(workers=1)
+    assert report["valid"] and report["checked_from"] == 0
+    blockchain.close()
+
+def test_listener_can_submit_follow_up_transactions():
+    blockchain = MedChainBlockchain(OrderingServiceConsensus(signing_key=SIGNING_KEY))
+    seen = []
+
+    def listener(block):
+        seen.append(block.index)
+        if block.transactions and block.transactions[0]["type"] == "TEST":
+            blockchain.commit_transactions([{"type": "FOLLOW_UP", "of": block.index}])
+
+    blockchain.add_block_listener(listener)
+    worker = threading.Thread(target=blockchain.commit_transactions, args=([{"type": "TEST"}],), daemon=True)
+    worker.start()
+    worker.join(timeout=5)
+    assert not worker.is_alive(), "listener re-entry deadlocked"
+    assert seen == [1, 2]
+    assert blockchain.chain[2].transactions[0]["type"] == "FOLLOW_UP"
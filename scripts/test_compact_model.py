@@ -0,0 +1,58 @@
+"""
+MedChain Compact Model Tests
+Compact forest predictions and atomic export swaps
+"""
+
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+ensemble = pytest.importorskip("sklearn.ensemble")
+
+from compact_model import META_FILE, export_compact_model, load_compact_model
+
+def forest_model_data(estimator_class, seed=0):
+    rng = np.random.RandomState(seed)
+    X = rng.rand(500, 4) * [10, 5, 12, 2024]
+    y = X[:, 0] * 30 + np.sin(X[:, 2]) * 50 + rng.rand(500) * 10
+    model = estimator_class(n_estimators=25, max_depth=8, random_state=seed).fit(X, y)
+    return {
+        'model': model,
+        'drug_encoding': {'Paracetamol 500mg': 0},
+        'region_encoding': {'Rural': 0},
+        'feature_names': ['drug_encoded', 'region_encoded', 'month', 'year'],
+        'performance': {'mae': 1.0},
+        'interval_scale': 1.5
+    }, X
+
+@pytest.mark.parametrize("estimator", ["RandomForestRegressor", "ExtraTreesRegressor"])
+def test_compact_forest_matches_sklearn(tmp_path, estimator):
+    model_data, X = forest_model_data(getattr(ensemble, estimator))
+    path = tmp_path / "model"
+    export_compact_model(model_data, str(path))
+    compact = load_compact_model(str(path))
+
+    # More rows than one ROW_BLOCK, so blocked evaluation is covered too
+    X = np.concatenate([X, np.random.RandomState(1).rand(1500, 4) * [10, 5, 12, 2024]])
+    model = model_data['model']
+    per_tree = np.stack([tree.predict(X.astype(np.float32)) for tree in model.estimators_])
+    np.testing.assert_array_equal(compact['model'].predict_per_tree(X), per_tree)
+    np.testing.assert_allclose(compact['model'].predict(X), model.predict(X), rtol=0, atol=1e-9)
+    assert compact['interval_scale'] == 1.5
+
+def test_re_export_swaps_the_whole_model_at_once(tmp_path):
+    first, X = forest_model_data(ensemble.RandomForestRegressor, seed=0)
+    second, _ = forest_model_data(ensemble.RandomForestRegressor, seed=1)
+    path = tmp_path / "model"
+
+    export_compact_model(first, str(path))
+    old = load_compact_model(str(path))
+    export_compact_model(second, str(path))
+    export_compact_model(first, str(path))
+
+    assert os.path.islink(path) and os.path.isfile(path / META_FILE)
+    # The arrays mapped before the swaps still describe the first model
+    np.testing.assert_allclose(old['model'].predict(X), first['model'].predict(X), atol=1e-9)
+    # Only the current version and the one before it are kept
+    assert len([name for name in os.listdir(tmp_path) if name != "model"]) == 2
@@ -0,0 +1,46 @@
+"""
+MedChain Feature Engineering Tests
+Vectorized features against the original per-row derivation
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pd = pytest.importorskip("pandas")
+
+from feature_engineering import FEATURE_NAMES, build_features
+
+DRUG_ENCODING = {"Paracetamol 500mg": 0, "Amoxicillin 250mg": 1, "ORS Packets": 2}
+REGION_ENCODING = {"Rural Areas": 0, "Urban Areas": 1, "Metro Cities": 2, "Tribal Areas": 3}
+
+def baseline_features(drug_name, region, month, year):
+    """The per-row derivation predict_demand and train_model used before feature_engineering"""
+    return {
+        'drug_encoded': DRUG_ENCODING.get(drug_name, 0),
+        'region_encoded': REGION_ENCODING.get(region, 0),
+        'month': month,
+        'year': year,
+        'is_rural': 1 if region in ["Rural Areas", "Tribal Areas"] else 0,
+        'is_winter': 1 if month in [11, 12, 1, 2] else 0,
+        'is_monsoon': 1 if month in [6, 7, 8, 9] else 0,
+        'population_density': 1 if region == "Metro Cities" else 2 if region == "Urban Areas" else 3,
+        'healthcare_access': 3 if region == "Metro Cities" else 2 if region == "Urban Areas" else 1
+    }
+
+def test_build_features_matches_the_per_row_baseline():
+    drugs = list(DRUG_ENCODING) + ["Unknown Drug"]
+    regions = list(REGION_ENCODING) + ["Coastal Areas"]
+    rows = [(drug, region, month, year) for drug in drugs for region in regions
+            for month in range(1, 13) for year in (2024, 2025)]
+    frame = pd.DataFrame(rows, columns=['drug_name', 'region', 'month', 'year'])
+
+    features = build_features(frame, DRUG_ENCODING, REGION_ENCODING)
+    expected = pd.DataFrame([baseline_features(*row) for row in rows])[FEATURE_NAMES]
+
+    assert list(features.columns) == FEATURE_NAMES
+    np.testing.assert_array_equal(features.to_numpy(), expected.to_numpy())
+
+def test_build_features_rejects_invalid_months():
+    frame = pd.DataFrame({'drug_name': ["ORS Packets"], 'region': ["Rural Areas"], 'month': [13], 'year': [2025]})
+    with pytest.raises(ValueError):
+        build_features(frame, DRUG_ENCODING, REGION_ENCODING)
@@ -0,0 +1,122 @@
+"""
+MedChain Incremental Training Tests
+Batch buffering, the overlap window and state persistence against mongomock
+"""
+
+import json
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+pytest.importorskip("sklearn")
+
+import joblib
+from sklearn.ensemble import RandomForestRegressor
+
+import incremental_training
+from ai_model_training import generate_training_data
+from feature_engineering import FEATURE_NAMES, build_features
+from incremental_training import load_training_state, update_model_from_history
+
+BATCH_SIZE = 500
+TREES_PER_UPDATE = 10
+INITIAL_TREES = 5
+
+@pytest.fixture
+def history():
+    return generate_training_data(samples_per_cell=3).sample(frac=1, random_state=7).reset_index(drop=True)
+
+@pytest.fixture
+def paths(tmp_path, history):
+    drug_encoding = {drug: i for i, drug in enumerate(history['drug_name'].unique())}
+    region_encoding = {region: i for i, region in enumerate(history['region'].unique())}
+    X = build_features(history, drug_encoding, region_encoding)[FEATURE_NAMES]
+    model = RandomForestRegressor(n_estimators=INITIAL_TREES, random_state=42).fit(X, history['demand'])
+    model_path, state_path = str(tmp_path / "model.pkl"), str(tmp_path / "training_state.json")
+    joblib.dump({
+        'model': model, 'drug_encoding': drug_encoding, 'region_encoding': region_encoding,
+        'feature_names': FEATURE_NAMES, 'performance': {}, 'interval_scale': 1.0
+    }, model_path)
+    return model_path, state_path
+
+@pytest.fixture
+def db():
+    return mongomock.MongoClient().medchain_test
+
+def insert(db, history, start, stop):
+    columns = ['drug_name', 'region', 'month', 'year', 'demand']
+    db.demand_history.insert_many(history.iloc[start:stop][columns].to_dict('records'))
+
+def update(db, paths):
+    model_path, state_path = paths
+    return update_model_from_history(db, model_path, state_path, batch_size=BATCH_SIZE,
+                                     trees_per_update=TREES_PER_UPDATE)
+
+def test_partial_batch_is_held_until_the_next_run(db, history, paths):
+    insert(db, history, 0, 700)
+    model_data = update(db, paths)
+    state = load_training_state(paths[1])
+    assert state['records_trained'] == 500
+    assert state['untrained_since'] is not None
+    assert len(model_data['model'].estimators_) == INITIAL_TREES + TREES_PER_UPDATE
+
+    # 200 held-back records are still too few on their own
+    model_data = update(db, paths)
+    assert load_training_state(paths[1])['records_trained'] == 500
+    assert len(model_data['model'].estimators_) == INITIAL_TREES + TREES_PER_UPDATE
+
+    # With 300 more they make up a full batch
+    insert(db, history, 700, 1000)
+    model_data = update(db, paths)
+    state = load_training_state(paths[1])
+    assert state['records_trained'] == 1000
+    assert state['untrained_since'] is None
+    assert len(model_data['model'].estimators_) == INITIAL_TREES + 2 * TREES_PER_UPDATE
+
+def test_records_are_never_trained_twice_across_the_overlap_window(db, history, paths, monkeypatch):
+    fitted = []
+    original_fit = RandomForestRegressor.fit
+    monkeypatch.setattr(RandomForestRegressor, "fit",
+                        lambda self, X, y, *args, **kwargs: fitted.append(len(X)) or original_fit(self, X, y))
+
+    insert(db, history, 0, 1000)
+    update(db, paths)
+    # Everything is inside the overlap window, so each run re-reads all of it
+    insert(db, history, 1000, 1500)
+    update(db, paths)
+    update(db, paths)
+
+    state = load_training_state(paths[1])
+    assert state['records_trained'] == 1500
+    assert len(state['recent_ids']) == 1500
+    assert db.demand_history.count_documents({}) == 1500
+    # Each update holds a share of its batch out of fitting for calibration
+    assert len(fitted) == 3 and sum(fitted) < 1500
+
+def test_state_is_written_only_after_the_model_is_saved(db, history, paths, monkeypatch):
+    model_path, state_path = paths
+    events = []
+    original_dump = incremental_training.joblib.dump
+    original_save = incremental_training.save_training_state
+    monkeypatch.setattr(incremental_training.joblib, "dump",
+                        lambda *args, **kwargs: events.append("model") or original_dump(*args, **kwargs))
+    monkeypatch.setattr(incremental_training, "save_training_state",
+                        lambda *args, **kwargs: events.append("state") or original_save(*args, **kwargs))
+
+    insert(db, history, 0, 500)
+    update(db, paths)
+    assert events == ["model", "state"]
+
+    # A failed model save leaves the previous state, so the next run retries the same records
+    with open(state_path) as f:
+        saved = json.load(f)
+    insert(db, history, 500, 1000)
+
+    def failing_dump(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(incremental_training.joblib, "dump", failing_dump)
+    with pytest.raises(OSError):
+        update(db, paths)
+    with open(state_path) as f:
+        assert json.load(f) == saved
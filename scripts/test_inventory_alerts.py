@@ -0,0 +1,110 @@
+"""
+MedChain Inventory Alert Engine Tests
+Heap ordering, lazy deletion, expiry rescoring, polling and heap compaction
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+
+from inventory_alerts import EXPIRY_HORIZON_DAYS, POLL_OVERLAP_SECONDS, InventoryAlertEngine, alert_priority
+
+# top() rescores expiry against the real clock, so items are scored as of today
+TODAY = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+def item(_id, current_stock=100, min_threshold=50, expiry_days=365, location_type="urban", **fields):
+    return {
+        "_id": _id, "drug_name": "Paracetamol 500mg", "location": f"Store {_id}",
+        "location_type": location_type, "current_stock": current_stock, "min_threshold": min_threshold,
+        "expiry_date": (TODAY + timedelta(days=expiry_days)).strftime("%Y-%m-%d"), **fields
+    }
+
+@pytest.fixture
+def collection():
+    return mongomock.MongoClient().medchain_test.inventory
+
+def top_ids(engine, n=10):
+    return [entry["_id"] for _, entry in engine.top(n)]
+
+def test_top_orders_items_by_priority(collection):
+    engine = InventoryAlertEngine(collection)
+    engine.update(item("ok"), TODAY)
+    engine.update(item("low", current_stock=25), TODAY)
+    engine.update(item("empty", current_stock=0), TODAY)
+    engine.update(item("rural-low", current_stock=25, location_type="rural"), TODAY)
+
+    assert top_ids(engine) == ["empty", "rural-low", "low"]
+    assert top_ids(engine, 2) == ["empty", "rural-low"]
+    assert top_ids(engine) == ["empty", "rural-low", "low"]  # top() leaves the heap intact
+    assert len(engine) == 3
+
+def test_stale_entries_are_skipped_lazily(collection):
+    engine = InventoryAlertEngine(collection)
+    engine.update(item("a", current_stock=0), TODAY)
+    engine.update(item("b", current_stock=25), TODAY)
+
+    engine.update(item("a", current_stock=100), TODAY)  # Restocked: no longer critical
+    assert top_ids(engine) == ["b"]
+    engine.update(item("a", current_stock=10), TODAY)
+    assert top_ids(engine) == ["a", "b"]
+    engine.remove("a")
+    assert len(engine._heap) > len(engine)  # Stale entries stay in the heap until they surface
+    assert top_ids(engine) == ["b"]
+    assert len(engine._heap) == 1  # ...and top() drops them once they do
+
+def test_refresh_expiry_rescores_items_entering_the_horizon(collection):
+    engine = InventoryAlertEngine(collection)
+    expiring = item("expiring", expiry_days=EXPIRY_HORIZON_DAYS + 10)
+    engine.update(expiring, TODAY)
+    assert len(engine) == 0
+
+    assert engine.refresh_expiry(TODAY + timedelta(days=5)) == 0
+    assert len(engine) == 0
+    assert engine.refresh_expiry(TODAY + timedelta(days=11)) == 1
+    assert len(engine) == 1
+    score, _ = engine._entries["expiring"][:2]
+    assert score == pytest.approx(alert_priority(expiring, TODAY + timedelta(days=11)))
+
+    # Each later day raises the urgency again, up to the expiry date
+    assert engine.refresh_expiry(TODAY + timedelta(days=12, hours=1)) == 1
+    assert engine._entries["expiring"][0] > score
+
+def test_removed_items_are_not_rescored(collection):
+    engine = InventoryAlertEngine(collection)
+    engine.update(item("gone", expiry_days=EXPIRY_HORIZON_DAYS + 1), TODAY)
+    engine.remove("gone")
+    assert engine.refresh_expiry(TODAY + timedelta(days=30)) == 0
+    assert len(engine) == 0
+
+def test_poll_skips_writes_already_applied_in_the_overlap_window(collection):
+    now = datetime.utcnow()
+    collection.insert_many([
+        item("a", current_stock=10, last_updated=now - timedelta(seconds=30)),
+        item("b", current_stock=20, last_updated=now)
+    ])
+    engine = InventoryAlertEngine(collection)
+    assert engine.poll() == 2
+    assert engine.poll() == 0  # The overlap window is re-read but nothing new is applied
+
+    # A late write stamped behind the high-water mark, but inside the window
+    collection.insert_one(item("late", current_stock=0, last_updated=now - timedelta(seconds=60)))
+    collection.update_one({"_id": "a"}, {"$set": {"current_stock": 100, "last_updated": now}})
+    assert engine.poll() == 2
+    assert top_ids(engine) == ["late", "b"]
+    assert engine.poll() == 0
+
+    # Writes older than the window are forgotten, so the applied set stays bounded
+    assert all(applied[1] >= now - timedelta(seconds=POLL_OVERLAP_SECONDS) for applied in engine._applied)
+
+def test_compaction_keeps_both_heaps_bounded(collection):
+    engine = InventoryAlertEngine(collection)
+    for i in range(1000):
+        # Critical and non-critical items both push an expiry entry on every update
+        engine.update(item("critical", current_stock=i % 10, expiry_days=200), TODAY)
+        engine.update(item("fine", expiry_days=200), TODAY)
+
+    assert len(engine._heap) <= 2 * len(engine._entries) + 64
+    assert len(engine._expiry_heap) <= 2 * len(engine._scheduled) + 64
+    assert top_ids(engine) == ["critical"]
@@ -0,0 +1,97 @@
+"""
+MedChain Ledger Storage Tests
+Reopen and crash-recovery behaviour of the segmented block log
+"""
+
+import os
+
+from blockchain_simulator import Block
+from ledger_storage import INDEX_ENTRY, BlockIndexLog, SegmentedBlockLog
+
+SEGMENT_SIZE = 2048  # Small enough that a few blocks roll over to a new segment
+
+def make_block(index, previous_hash="0"):
+    transactions = [{"transaction_id": f"TX-{index}-{i}", "batch_id": f"BATCH-{index}", "quantity": i} for i in range(3)]
+    block = Block(index, transactions, previous_hash)
+    block.mine_block(difficulty=1)
+    return block
+
+def open_log(directory):
+    return SegmentedBlockLog(str(directory), Block.from_dict, segment_size=SEGMENT_SIZE)
+
+def fill(log, count):
+    blocks = []
+    for index in range(len(log), len(log) + count):
+        blocks.append(make_block(index, log[-1].hash if len(log) else "0"))
+        log.append(blocks[-1])
+    return blocks
+
+def segment_files(directory):
+    return sorted(name for name in os.listdir(directory) if name.startswith("segment-"))
+
+def test_reopen_reads_every_block(tmp_path):
+    log = open_log(tmp_path)
+    blocks = fill(log, 10)
+    log.close()
+    assert len(segment_files(tmp_path)) > 1
+
+    log = open_log(tmp_path)
+    assert len(log) == 10
+    assert [block.hash for block in log] == [block.hash for block in blocks]
+    assert log.read_transaction(4, 2) == blocks[4].transactions[2]
+    log.close()
+
+def test_torn_tail_in_active_segment_is_discarded(tmp_path):
+    log = open_log(tmp_path)
+    fill(log, 3)
+    log.close()
+    with open(tmp_path / segment_files(tmp_path)[-1], "ab") as f:
+        f.write(b"partial record left by a crash")
+
+    log = open_log(tmp_path)
+    fill(log, 1)
+    assert [block.index for block in log] == [0, 1, 2, 3]
+    log.close()
+
+def test_unindexed_next_segment_is_discarded(tmp_path):
+    log = open_log(tmp_path)
+    fill(log, 3)
+    log.close()
+    last_segment = int(segment_files(tmp_path)[-1][8:-4])
+    with open(tmp_path / f"segment-{last_segment + 1:06d}.log", "wb") as f:
+        f.write(b"garbage from a crash during rollover")
+
+    log = open_log(tmp_path)
+    blocks = fill(log, 6)  # Enough to roll over into the discarded segment
+    log.close()
+
+    log = open_log(tmp_path)
+    assert [block.hash for block in log][3:] == [block.hash for block in blocks]
+    log.close()
+
+def test_torn_index_entry_is_dropped(tmp_path):
+    log = open_log(tmp_path)
+    fill(log, 2)
+    log.close()
+    with open(tmp_path / "index.bin", "ab") as f:
+        f.write(b"\x00" * (INDEX_ENTRY.size - 1))
+
+    log = open_log(tmp_path)
+    assert len(log) == 2
+    fill(log, 1)
+    assert log[2].previous_hash == log[1].hash
+    log.close()
+
+def test_index_log_survives_torn_line(tmp_path):
+    log = BlockIndexLog(str(tmp_path / "tx_index.jsonl"))
+    for block_index in range(3):
+        log.append(block_index, [[f"TX-{block_index}", f"BATCH-{block_index}", None]])
+    log.close()
+    with open(tmp_path / "tx_index.jsonl", "ab") as f:
+        f.write(b'[3, [["TX-3"')
+
+    log = BlockIndexLog(str(tmp_path / "tx_index.jsonl"))
+    assert log.count == 3
+    log.append(3, [["TX-3", "BATCH-3", None]])
+    assert [block_index for block_index, _ in log] == [0, 1, 2, 3]
+    log.close()
@@ -0,0 +1,115 @@
+"""
+MedChain Ledger Sync Tests
+Block replays, retries and chain restarts against a recording fake database
+"""
+
+import pytest
+
+mongomock = pytest.importorskip("mongomock")
+from pymongo.errors import AutoReconnect
+
+from blockchain_simulator import MedChainBlockchain, OrderingServiceConsensus
+from ledger_sync import MongoLedgerSync
+
+SIGNING_KEY = b"test-orderer-key"
+
+class RecordingCollection:
+    """Applies bulk_write operations one by one to a mongomock collection and records them"""
+
+    def __init__(self, collection):
+        self.collection = collection
+        self.bulk_writes = []
+        self.failures = 0  # Number of upcoming bulk_write calls that fail
+
+    def bulk_write(self, operations, ordered=True):
+        if self.failures:
+            self.failures -= 1
+            raise AutoReconnect("connection reset")
+        self.bulk_writes.append(operations)
+        for operation in operations:
+            self.collection.update_one(operation._filter, operation._doc, upsert=operation._upsert)
+
+    def find_one(self, *args, **kwargs):
+        return self.collection.find_one(*args, **kwargs)
+
+    def count_documents(self, query):
+        return self.collection.count_documents(query)
+
+class RecordingDatabase:
+    def __init__(self):
+        db = mongomock.MongoClient().medchain_test
+        self.name = db.name
+        self.drug_batches = RecordingCollection(db.drug_batches)
+        self.audit_logs = RecordingCollection(db.audit_logs)
+
+def new_chain():
+    return MedChainBlockchain(OrderingServiceConsensus(signing_key=SIGNING_KEY))
+
+def create_batch(blockchain, quantity, batch_id="BATCH-1"):
+    return blockchain.commit_transactions([{
+        "type": "CREATE_BATCH", "batch_id": batch_id, "drug_name": "Paracetamol 500mg",
+        "manufacturer": "Sun Pharma", "quantity": quantity
+    }])
+
+@pytest.fixture
+def db():
+    return RecordingDatabase()
+
+def test_replaying_an_older_block_keeps_the_newer_batch(db):
+    blockchain = new_chain()
+    older, newer = create_batch(blockchain, 100), create_batch(blockchain, 200)
+    sync = MongoLedgerSync(db, retry_delay=0)
+
+    assert sync.sync_block(newer) and sync.sync_block(older)
+    batch = db.drug_batches.find_one({"batch_id": "BATCH-1"})
+    assert batch["quantity"] == 200
+    assert batch["blockchain_tx_id"] == newer.transactions[0]["transaction_id"]
+    assert batch["block_hash"] == newer.hash
+    assert db.audit_logs.count_documents({}) == 2
+    sync.close()
+
+def test_batch_recreated_on_a_restarted_chain_is_updated(db):
+    first_run = new_chain()
+    for quantity in (100, 200, 300):
+        last = create_batch(first_run, quantity)
+    sync = MongoLedgerSync(db, retry_delay=0)
+    sync.sync_block(last)
+
+    # A new process starts a fresh in-memory chain, so the batch lands in block 1 again
+    restarted = create_batch(new_chain(), 400)
+    assert restarted.index < last.index
+    sync.sync_block(restarted)
+    batch = db.drug_batches.find_one({"batch_id": "BATCH-1"})
+    assert batch["quantity"] == 400
+    assert batch["block_hash"] == restarted.hash
+    sync.close()
+
+def test_failed_block_is_retried_without_duplicates(db):
+    blockchain = new_chain()
+    block = create_batch(blockchain, 100)
+    sync = MongoLedgerSync(db, max_retries=0, retry_delay=0)
+
+    db.drug_batches.failures = 1
+    assert not sync.sync_block(block)
+    assert sync.failed_blocks == [block]
+
+    assert sync.retry_failed() == 1
+    assert sync.retry_failed() == 0
+    sync.sync_block(block)  # A further replay changes nothing
+    assert db.drug_batches.count_documents({}) == 1
+    assert db.audit_logs.count_documents({}) == 1
+    assert db.drug_batches.find_one({"batch_id": "BATCH-1"})["status"] == "active"
+    sync.close()
+
+def test_listener_writes_each_sealed_block(db):
+    blockchain = new_chain()
+    sync = MongoLedgerSync(db, retry_delay=0)
+    blockchain.add_block_listener(sync)
+    create_batch(blockchain, 100, batch_id="BATCH-A")
+    create_batch(blockchain, 100, batch_id="BATCH-B")
+    sync.flush()
+
+    assert sync.synced_blocks == 2
+    assert len(db.drug_batches.bulk_writes) == 2
+    assert {batch["block_index"] for batch in db.drug_batches.collection.find()} == {1, 2}
+    sync.close()
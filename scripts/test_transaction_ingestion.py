@@ -0,0 +1,59 @@
+"""
+MedChain Transaction Ingestion Tests
+Block-inclusion receipts and shutdown of the asyncio ingestion pipeline
+"""
+
+import asyncio
+
+import pytest
+
+from blockchain_simulator import MedChainBlockchain, OrderingServiceConsensus
+from transaction_ingestion import AsyncIngestionPipeline
+
+def make_pipeline(**kwargs):
+    blockchain = MedChainBlockchain(OrderingServiceConsensus(signing_key=b"test-orderer-key"))
+    return blockchain, AsyncIngestionPipeline(blockchain, **kwargs)
+
+def test_receipts_point_at_the_sealing_block():
+    async def run():
+        blockchain, pipeline = make_pipeline(max_batch_size=4, batch_timeout=0.01)
+        async with pipeline:
+            receipts = await asyncio.gather(*(pipeline.submit({"type": "TEST", "i": i}) for i in range(10)))
+        return blockchain, receipts
+
+    blockchain, receipts = asyncio.run(run())
+    assert len({receipt["transaction_id"] for receipt in receipts}) == 10
+    for i, receipt in enumerate(receipts):
+        block = blockchain.chain[receipt["block_index"]]
+        assert block.hash == receipt["block_hash"]
+        transaction = block.transactions[receipt["tx_index"]]
+        assert transaction["transaction_id"] == receipt["transaction_id"]
+        assert transaction["i"] == i
+
+def test_submit_after_stop_is_rejected():
+    async def run():
+        _, pipeline = make_pipeline()
+        async with pipeline:
+            pass
+        await pipeline.submit({"type": "TEST"})
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(run())
+
+def test_every_receipt_resolves_when_stopping():
+    async def run():
+        _, pipeline = make_pipeline(max_queue_size=2, max_batch_size=2, batch_timeout=0.01)
+        await pipeline.start()
+        pending = [asyncio.create_task(pipeline.submit({"type": "TEST", "i": i})) for i in range(6)]
+        await asyncio.sleep(0)
+        stopping = asyncio.create_task(pipeline.stop())
+        await asyncio.sleep(0)
+        late = asyncio.create_task(pipeline.submit({"type": "TEST", "i": "late"}))
+        await stopping
+        return await asyncio.wait_for(asyncio.gather(*pending, late, return_exceptions=True), timeout=2)
+
+    results = asyncio.run(run())
+    assert len(results) == 7
+    assert all(isinstance(result, (dict, RuntimeError)) for result in results)
+    assert isinstance(results[0], dict)
+    assert isinstance(results[-1], RuntimeError)
@@ -0,0 +1,120 @@
+"""
+MedChain Transaction Ingestion
+Asyncio front end that batches concurrent submissions into blocks with backpressure
+"""
+
+import asyncio
+from typing import Dict, List, Optional, Tuple
+
+from blockchain_simulator import MedChainBlockchain
+
+class AsyncIngestionPipeline:
+    """Bounded ingestion queue drained into blocks by a background sealer.
+
+    Producers await submit(), which blocks while the queue is full and resolves
+    with a block-inclusion receipt once the transaction's block is sealed.
+    """
+
+    def __init__(self, blockchain: MedChainBlockchain, max_queue_size: int = 10000,
+                 max_batch_size: int = 500, batch_timeout: float = 0.05):
+        self.blockchain = blockchain
+        self.max_queue_size = max_queue_size
+        self.max_batch_size = max_batch_size
+        self.batch_timeout = batch_timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._sealer: Optional[asyncio.Task] = None
+        self._stopping = False  # Set once stop() begins, so no submit can queue behind the sentinel
+
+    async def start(self):
+        """Start the background sealer on the running event loop"""
+        if self._sealer is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._stopping = False
+        self._sealer = asyncio.create_task(self._run_sealer())
+
+    async def stop(self):
+        """Seal everything already queued, then stop the sealer"""
+        if self._sealer is None or self._stopping:
+            return
+        self._stopping = True
+        await self._queue.put(None)
+        await self._sealer
+        self._sealer = None
+        self._fail_queued(self._queue)
+
+    def _fail_queued(self, queue: asyncio.Queue):
+        """Fail the receipts of transactions left in a stopped pipeline's queue"""
+        while not queue.empty():
+            item = queue.get_nowait()
+            if item is not None and not item[1].done():
+                item[1].set_exception(RuntimeError("Ingestion pipeline stopped before the transaction was sealed"))
+
+    async def __aenter__(self) -> "AsyncIngestionPipeline":
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.stop()
+
+    async def submit(self, transaction: Dict) -> Dict:
+        """Queue a transaction and wait for its block-inclusion receipt"""
+        if self._sealer is None or self._stopping:
+            raise RuntimeError("Ingestion pipeline is not running")
+
+        receipt = asyncio.get_running_loop().create_future()
+        queue = self._queue
+        await queue.put((transaction, receipt))  # Waits here when the queue is full
+        if self._sealer is None or queue is not self._queue:
+            self._fail_queued(queue)  # The pipeline stopped while this put waited for room
+        return await receipt
+
+    async def _collect_batch(self) -> Tuple[List[Tuple[Dict, asyncio.Future]], bool]:
+        """Wait for one item, then gather more until the batch is full or times out"""
+        loop = asyncio.get_running_loop()
+        first = await self._queue.get()
+        if first is None:
+            return [], True
+
+        batch = [first]
+        deadline = loop.time() + self.batch_timeout
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run_sealer(self):
+        """Drain the queue into blocks until stopped"""
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._collect_batch()
+            if not batch:
+                continue
+
+            transactions = [transaction for transaction, _ in batch]
+            try:
+                # Sealing may run proof of work, so keep it off the event loop
+                block = await loop.run_in_executor(None, self.blockchain.commit_transactions, transactions)
+            except Exception as exc:
+                for _, receipt in batch:
+                    if not receipt.done():
+                        receipt.set_exception(exc)
+                continue
+
+            for tx_index, (transaction, receipt) in enumerate(batch):
+                if not receipt.done():
+                    receipt.set_result({
+                        "transaction_id": transaction["transaction_id"],
+                        "block_index": block.index,
+                        "block_hash": block.hash,
+                        "tx_index": tx_index
+                    })